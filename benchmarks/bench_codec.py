@@ -0,0 +1,110 @@
+"""Preset codec benchmark.
+
+Compares loading and saving presets through dataclasses_json with the
+hand-written codec in src.codec, and the sequential with the parallel bulk
+loader. Results are printed as one JSON object per case:
+
+    python -m benchmarks.bench_codec [-n PRESETS] [-b BADGES] [-r REPEAT]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable
+
+from benchmarks.corpus import generate_corpus
+from src import codec
+from src.models import LeatherBand
+
+
+def best_of(call: Callable[[], object], repeat: int) -> list[float]:
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        call()
+        durations.append((time.perf_counter_ns() - start) / 1e6)
+    return durations
+
+
+def load_dataclasses_json(paths: list[str]) -> list[LeatherBand]:
+    bands = []
+    for path in paths:
+        with open(path, "r") as f:
+            bands.append(LeatherBand.from_json(f.read()))  # pyright: ignore[reportAttributeAccessIssue]
+    return bands
+
+
+def load_codec(paths: list[str]) -> list[LeatherBand]:
+    bands = []
+    for path in paths:
+        with open(path, "rb") as f:
+            bands.append(codec.loads(f.read()))
+    return bands
+
+
+def load_codec_parallel(paths: list[str]) -> list[LeatherBand]:
+    return [preset.band for preset in codec.load_presets(paths)]  # pyright: ignore[reportReturnType]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the preset codec.")
+    parser.add_argument("-n", "--presets", type=int, default=1000)
+    parser.add_argument("-b", "--badges", type=int, default=20)
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    root = tempfile.mkdtemp(prefix="lederband-bench-")
+    try:
+        paths = [
+            os.path.join(root, path)
+            for path in generate_corpus(root, args.presets, args.badges, args.seed)
+        ]
+
+        reference = load_dataclasses_json(paths)
+        loaders = {
+            "load[dataclasses_json]": load_dataclasses_json,
+            "load[codec]": load_codec,
+            "load[codec_parallel]": load_codec_parallel,
+        }
+        cases: dict[str, Callable[[], object]] = {}
+        for name, loader in loaders.items():
+            if loader(paths) != reference:
+                print(f"{name} does not match dataclasses_json", file=sys.stderr)
+                return 1
+            cases[name] = lambda loader=loader: loader(paths)
+        cases["encode[dataclasses_json]"] = lambda: [
+            band.to_json()  # pyright: ignore[reportAttributeAccessIssue]
+            for band in reference
+        ]
+        cases["encode[codec]"] = lambda: [codec.dumps(band) for band in reference]
+
+        for name, call in cases.items():
+            durations = best_of(call, args.repeat)
+            print(
+                json.dumps(
+                    {
+                        "benchmark": "codec",
+                        "case": name,
+                        "presets": args.presets,
+                        "badges_per_preset": args.badges,
+                        "repeat": args.repeat,
+                        "min_ms": round(min(durations), 3),
+                        "mean_ms": round(statistics.fmean(durations), 3),
+                        "per_preset_us": round(min(durations) * 1e3 / args.presets, 2),
+                    }
+                ),
+                flush=True,
+            )
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+"""Engine benchmark suite.
+
+Generates a synthetic corpus (see benchmarks.corpus) and times the render
+pipeline stages over the first N presets for every requested corpus size.
+Results are printed as one JSON object per stage and corpus size:
+
+    python -m benchmarks.bench_engine [--sizes 1,10,100] [-b BADGES]
+        [--root DIR] [--cold-limit N] [--raw-store] [-o results.jsonl]
+
+"cold" stages clear the in-process caches and the on-disk caches under the
+corpus root before every iteration and are limited to --cold-limit
+iterations per corpus size. With --raw-store, images are decoded through
+a raw store under the corpus root.
+"""
+
+import argparse
+import io
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable
+
+from benchmarks.corpus import generate_corpus
+from src.buttonhole import buttonhole_cache
+from src.cache import image_cache
+from src.engine import COMPOSITOR_NUMPY, COMPOSITOR_PIL, Engine
+from src.models import BadgeRow, LeatherBand
+from src.rawstore import RawImageStore
+from src.scaling import scaled_layer_cache
+from src.text import name_layer_cache
+
+DEFAULT_SIZES = [1, 10, 100]
+
+
+@contextmanager
+def working_directory(path: str):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def clear_caches():
+    image_cache.clear()
+    scaled_layer_cache.clear()
+    name_layer_cache.clear()
+    buttonhole_cache.clear()
+    shutil.rmtree(buttonhole_cache.path, ignore_errors=True)
+    if image_cache.raw_store is not None:
+        shutil.rmtree(image_cache.raw_store.path, ignore_errors=True)
+
+
+def time_calls(calls: Iterable[Callable[[], object]], before=None) -> list[float]:
+    """Run every call and return the durations in milliseconds.
+
+    before is run ahead of every call and is not timed.
+    """
+    durations = []
+    for call in calls:
+        if before is not None:
+            before()
+        start = time.perf_counter_ns()
+        call()
+        durations.append((time.perf_counter_ns() - start) / 1e6)
+    return durations
+
+
+def summarize(stage: str, corpus_size: int, durations: list[float]) -> dict:
+    ordered = sorted(durations)
+    return {
+        "benchmark": "engine",
+        "stage": stage,
+        "corpus_size": corpus_size,
+        "count": len(durations),
+        "total_ms": round(sum(durations), 3),
+        "mean_ms": round(statistics.fmean(durations), 4) if durations else None,
+        "p50_ms": round(ordered[len(ordered) // 2], 4) if ordered else None,
+        "p95_ms": round(ordered[int(len(ordered) * 0.95)], 4) if ordered else None,
+        "max_ms": round(ordered[-1], 4) if ordered else None,
+    }
+
+
+def run_corpus(preset_paths: list[str], cold_limit: int) -> list[dict]:
+    size = len(preset_paths)
+    results = []
+
+    def load(path):
+        return lambda: LeatherBand.load_from_file(path)
+
+    results.append(
+        summarize("load_from_file", size, time_calls(load(p) for p in preset_paths))
+    )
+    bands = [LeatherBand.load_from_file(path) for path in preset_paths]
+    names = [os.path.splitext(os.path.basename(path))[0] for path in preset_paths]
+    cold_bands = bands[:cold_limit]
+
+    engine = Engine(bands[0])
+
+    clear_caches()
+    results.append(
+        summarize(
+            "update_background_cold",
+            size,
+            time_calls(
+                ((lambda b=b: engine.set_band(b)) for b in cold_bands),
+                before=clear_caches,
+            ),
+        )
+    )
+    results.append(
+        summarize(
+            "update_background",
+            size,
+            time_calls((lambda b=b: engine.set_band(b)) for b in bands),
+        )
+    )
+
+    name_layer_cache.clear()
+    results.append(
+        summarize(
+            "set_name",
+            size,
+            time_calls((lambda n=n: engine.set_name(n)) for n in names),
+        )
+    )
+
+    create_row = engine._Engine__create_badge_row_image  # pyright: ignore[reportAttributeAccessIssue]
+    rows = [
+        item for band in bands for item in band.badges if isinstance(item, BadgeRow)
+    ]
+    results.append(
+        summarize(
+            "create_badge_row_image",
+            size,
+            time_calls((lambda r=r: create_row(r)) for r in rows),
+        )
+    )
+
+    images = []
+    for compositor in (COMPOSITOR_PIL, COMPOSITOR_NUMPY):
+        engine.compositor = compositor
+
+        def render(band, name):
+            def call():
+                engine.set_band(band)
+                engine.set_name(name)
+                images.append(engine.create_band_image())
+
+            return call
+
+        clear_caches()
+        results.append(
+            summarize(
+                f"create_band_image_cold[{compositor}]",
+                size,
+                time_calls(
+                    (render(b, n) for b, n in zip(cold_bands, names)),
+                    before=clear_caches,
+                ),
+            )
+        )
+        images.clear()
+        results.append(
+            summarize(
+                f"create_band_image[{compositor}]",
+                size,
+                time_calls(render(b, n) for b, n in zip(bands, names)),
+            )
+        )
+    engine.compositor = COMPOSITOR_PIL
+
+    def export(image):
+        return lambda: image.save(io.BytesIO(), format="PNG")
+
+    results.append(
+        summarize("export_png", size, time_calls(export(i) for i in images if i))
+    )
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the render pipeline.")
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(s) for s in DEFAULT_SIZES),
+        help="comma separated corpus sizes, e.g. 1,10,100,1000,10000",
+    )
+    parser.add_argument("-b", "--badges", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--root", help="corpus directory (default: a temporary directory)"
+    )
+    parser.add_argument("--cold-limit", type=int, default=100)
+    parser.add_argument(
+        "--raw-store", action="store_true", help="decode images through a raw store"
+    )
+    parser.add_argument("-o", "--output", help="also append results to this file")
+    args = parser.parse_args(argv)
+
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+    root = args.root or tempfile.mkdtemp(prefix="lederband-bench-")
+    root = os.path.abspath(root)
+    output = open(args.output, "a") if args.output else None
+
+    try:
+        preset_paths = generate_corpus(root, max(sizes), args.badges, args.seed)
+        buttonhole_cache.path = os.path.join(root, "cache", "buttonholes")
+        if args.raw_store:
+            image_cache.raw_store = RawImageStore(os.path.join(root, "cache", "raw"))
+        with working_directory(root):
+            for size in sizes:
+                for result in run_corpus(preset_paths[:size], args.cold_limit):
+                    result["badges_per_preset"] = args.badges
+                    result["raw_store"] = args.raw_store
+                    line = json.dumps(result)
+                    print(line, flush=True)
+                    if output is not None:
+                        output.write(line + "\n")
+    finally:
+        if output is not None:
+            output.close()
+        if args.root is None:
+            shutil.rmtree(root, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""Cold-start import benchmark.
+
+Imports each module in a fresh interpreter with -X importtime and reports
+the cumulative import time and which heavy dependencies got loaded, as one
+JSON object per line:
+
+    python -m benchmarks.bench_import [-n REPEAT] [module ...]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+DEFAULT_MODULES = ["src.models", "src.engine", "src.batch", "src.ui"]
+
+# Modules that should only be loaded when they are actually needed
+HEAVY_MODULES = ["cv2", "numpy", "tkinter", "customtkinter"]
+
+PROBE = (
+    "import {module}; import json, sys; "
+    "print(json.dumps([m for m in {heavy!r} if m in sys.modules]))"
+)
+
+
+def measure_import(module: str) -> tuple[float, list[str]]:
+    """Import module in a fresh interpreter.
+
+    Returns the cumulative import time in milliseconds and the heavy modules
+    that were loaded.
+    """
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            PROBE.format(module=module, heavy=HEAVY_MODULES),
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    cumulative_us = 0
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            cumulative_us = int(fields[1])
+    return cumulative_us / 1000, json.loads(result.stdout)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Measure cold import times.")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("-n", "--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    for module in args.modules:
+        times = []
+        heavy = []
+        for _ in range(args.repeat):
+            ms, heavy = measure_import(module)
+            times.append(ms)
+        print(
+            json.dumps(
+                {
+                    "benchmark": "import",
+                    "module": module,
+                    "repeat": args.repeat,
+                    "min_ms": round(min(times), 3),
+                    "median_ms": round(statistics.median(times), 3),
+                    "heavy_modules": heavy,
+                }
+            )
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
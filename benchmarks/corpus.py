@@ -0,0 +1,150 @@
+"""Synthetic asset and preset corpus for benchmarks.
+
+Generates backgrounds with a buttonhole, badges in the sizes that occur in
+practice and presets referencing them, laid out like the project folder:
+
+    <root>/input/backgrounds/*.png
+    <root>/input/badges/{matching,mismatched,half}/*.png
+    <root>/presets/*.json
+
+Preset paths are relative to <root>, so benchmarks run with <root> as the
+working directory, like the app does with the project folder.
+
+    python -m benchmarks.corpus ROOT [-n PRESETS] [-b BADGES]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+
+from PIL import Image, ImageDraw
+
+BACKGROUND_SIZE = (96, 720)
+NUM_BACKGROUNDS = 2
+# Badges per size class, presets pick from this pool
+NUM_BADGES = 12
+
+
+def _random_color(rng: random.Random, alpha: int = 255) -> tuple[int, int, int, int]:
+    return rng.randrange(256), rng.randrange(256), rng.randrange(256), alpha
+
+
+def make_background(size: tuple[int, int], rng: random.Random) -> Image.Image:
+    """Opaque background with one large and a few small transparent holes."""
+    width, height = size
+    image = Image.new("RGBA", size, _random_color(rng))
+    draw = ImageDraw.Draw(image)
+    for y in range(0, height, 4):
+        draw.line((0, y, width, y), fill=_random_color(rng))
+
+    # The buttonhole, the largest transparent area
+    hole_w, hole_h = width // 3, height // 6
+    left = (width - hole_w) // 2
+    draw.rectangle((left, 20, left + hole_w - 1, 20 + hole_h - 1), fill=(0, 0, 0, 0))
+    # Smaller holes that must not be picked
+    for _ in range(3):
+        x, y = rng.randrange(width - 4), rng.randrange(height // 3, height - 4)
+        draw.rectangle((x, y, x + 2, y + 2), fill=(0, 0, 0, 0))
+    return image
+
+
+def make_badge(size: tuple[int, int], rng: random.Random) -> Image.Image:
+    """Pixel-art style badge with a transparent border and some alpha."""
+    width, height = size
+    image = Image.new("RGBA", size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    draw.rounded_rectangle(
+        (0, 0, width - 1, height - 1), radius=3, fill=_random_color(rng)
+    )
+    for _ in range(8):
+        x, y = rng.randrange(width), rng.randrange(height)
+        draw.rectangle(
+            (x, y, x + rng.randrange(1, 6), y + rng.randrange(1, 6)),
+            fill=_random_color(rng, rng.choice((128, 255))),
+        )
+    return image
+
+
+def generate_corpus(
+    root: str,
+    num_presets: int,
+    badges_per_preset: int = 20,
+    seed: int = 0,
+    background_size: tuple[int, int] = BACKGROUND_SIZE,
+) -> list[str]:
+    """Generate a corpus under root and return the preset paths (relative)."""
+    rng = random.Random(seed)
+    width = background_size[0]
+
+    backgrounds = []
+    os.makedirs(os.path.join(root, "input", "backgrounds"), exist_ok=True)
+    for index in range(NUM_BACKGROUNDS):
+        path = os.path.join("input", "backgrounds", f"background_{index}.png")
+        make_background(background_size, rng).save(os.path.join(root, path))
+        backgrounds.append(path)
+
+    badge_widths = {
+        # Same width as the background, no scaling needed
+        "matching": lambda: width,
+        # Needs LANCZOS
+        "mismatched": lambda: width + rng.choice((-7, 5, 13)),
+        # Ideal width for two badges side by side
+        "half": lambda: width // 2 + 1,
+    }
+    badges: dict[str, list[str]] = {}
+    for kind, badge_width in badge_widths.items():
+        folder = os.path.join("input", "badges", kind)
+        os.makedirs(os.path.join(root, folder), exist_ok=True)
+        badges[kind] = []
+        for index in range(NUM_BADGES):
+            path = os.path.join(folder, f"{kind}_{index}.png")
+            size = (badge_width(), rng.randrange(12, 40))
+            make_badge(size, rng).save(os.path.join(root, path))
+            badges[kind].append(path)
+
+    presets = []
+    os.makedirs(os.path.join(root, "presets"), exist_ok=True)
+    for index in range(num_presets):
+        items = []
+        for _ in range(badges_per_preset):
+            kind = rng.choices(("matching", "mismatched", "row"), (6, 2, 2))[0]
+            if kind == "row":
+                items.append(
+                    {
+                        "badges": [
+                            {"image_path": rng.choice(badges["half"])}
+                            for _ in range(2)
+                        ]
+                    }
+                )
+            else:
+                items.append({"image_path": rng.choice(badges[kind])})
+        preset = {
+            "image_path": rng.choice(backgrounds),
+            "margin": rng.randrange(0, 12),
+            "badges": items,
+        }
+        path = os.path.join("presets", f"Preset {index:05d}.json")
+        with open(os.path.join(root, path), "w") as f:
+            json.dump(preset, f)
+        presets.append(path)
+    return presets
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generate a synthetic corpus.")
+    parser.add_argument("root", help="directory the corpus is written to")
+    parser.add_argument("-n", "--presets", type=int, default=100)
+    parser.add_argument("-b", "--badges", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    presets = generate_corpus(args.root, args.presets, args.badges, args.seed)
+    print(f"Generated {len(presets)} presets in {args.root}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
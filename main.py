@@ -1,9 +1,4 @@
-from src.ui import app
-
-
-def main():
-    app.mainloop()
-
+from src.ui import main
 
 if __name__ == "__main__":
     main()
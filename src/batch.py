@@ -0,0 +1,261 @@
+"""Headless batch renderer.
+
+Renders every preset JSON in a directory without the GUI and writes the
+bands to the export folder using the same naming as the app. Presets whose
+render key matches their last export in the export manifest are skipped:
+
+    python -m src.batch [presets/] [-o output/] [-j WORKERS] [--metrics FILE]
+        [--force] [--raw-store]
+
+With --raw-store, the workers keep decoded images under cache/raw, see
+RawImageStore.
+"""
+
+import argparse
+import os
+import pathlib
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+from itertools import repeat
+from typing import Optional
+
+from PIL import Image
+
+from .cache import image_cache
+from .codec import load_presets
+from .config import (
+    DEFAULT_EXPORT_PATH,
+    DEFAULT_PRESET_PATH,
+    EXPORT_DATE_FORMAT,
+    export_file_name,
+)
+from .engine import FONT_PATH, FONT_SIZE, Engine
+from .exports import ExportManifest, png_info, render_key
+from .metrics import Metrics
+from .models import LeatherBand
+from .rawstore import RawImageStore
+
+# One engine per worker process, reused across presets
+_engine: Optional[Engine] = None
+
+
+def init_worker(raw_store: bool = False):
+    """Set up a worker process; with raw_store, decoded images are shared."""
+    if raw_store:
+        image_cache.raw_store = RawImageStore()
+
+
+def find_presets(preset_dir: str) -> list[str]:
+    return sorted(str(path) for path in pathlib.Path(preset_dir).glob("*.json"))
+
+
+def render_band(
+    preset_path: str,
+    metrics_path: Optional[str] = None,
+    band: Optional[LeatherBand] = None,
+) -> Image.Image:
+    """Render a single preset file with the engine of this process.
+
+    If metrics_path is set, per-render stage timings are appended to it as
+    JSON lines. A band already loaded from preset_path is used instead of
+    reading the file again.
+    """
+    global _engine
+
+    if band is None:
+        band = LeatherBand.load_from_file(preset_path)
+    preset_name = pathlib.Path(preset_path).stem
+
+    if _engine is None:
+        metrics = Metrics(metrics_path) if metrics_path is not None else None
+        _engine = Engine(band, metrics=metrics)
+    _engine.set_band(band)
+    _engine.set_name(preset_name)
+
+    image = _engine.create_band_image()
+    if image is None:
+        raise ValueError(f"Nothing to render for preset: {preset_path}")
+    return image
+
+
+def render_preset(
+    preset_path: str,
+    export_dir: str,
+    date: str,
+    metrics_path: Optional[str] = None,
+    band: Optional[LeatherBand] = None,
+    key: Optional[str] = None,
+) -> tuple[str, str]:
+    """Render a single preset file.
+
+    band and key, if already known, save reading the preset and hashing
+    its images again. Returns the path of the exported image and its
+    render key.
+    """
+    image = render_band(preset_path, metrics_path, band)
+    assert _engine is not None
+    preset_name = pathlib.Path(preset_path).stem
+    if key is None:
+        key = _engine.render_key()
+    path = os.path.join(export_dir, export_file_name(date, preset_name))
+    _engine.save_image(image, path, pnginfo=png_info(key))
+    return path, key
+
+
+def current_key(
+    preset_path: str, band: LeatherBand, manifest: ExportManifest
+) -> tuple[Optional[str], bool]:
+    """Render key of a preset and whether its last export has the same key.
+
+    The key is None if it cannot be computed, e.g. for missing images.
+    """
+    preset_name = pathlib.Path(preset_path).stem
+    try:
+        key = render_key(band, preset_name, FONT_PATH, FONT_SIZE)
+    except (OSError, ValueError):
+        # Rendering reports the error
+        return None, False
+    return key, manifest.current_export(preset_name, key) is not None
+
+
+def render_presets(
+    preset_paths: list[str],
+    export_dir: str,
+    max_workers: Optional[int] = None,
+    metrics_path: Optional[str] = None,
+    force: bool = False,
+    raw_store: bool = False,
+) -> tuple[list[str], list[str], list[tuple[str, str]]]:
+    """Render presets across a process pool.
+
+    Returns the exported image paths, the presets skipped because their
+    export is up to date and a list of (preset, error) pairs for presets
+    that failed. With force, every preset is rendered. With raw_store, the
+    workers share decoded images through the raw store.
+    """
+    date = datetime.now().strftime(EXPORT_DATE_FORMAT)
+    os.makedirs(export_dir, exist_ok=True)
+    manifest = ExportManifest(export_dir)
+
+    failed = []
+    bands = {}
+    for preset in load_presets(preset_paths):
+        if preset.band is None:
+            failed.append((preset.path, str(preset.error)))
+        else:
+            bands[preset.path] = preset.band
+
+    # Hashing the images and reading the keys of the exports is I/O bound;
+    # image digests are shared between presets through file_digest
+    keys: dict[str, Optional[str]] = dict.fromkeys(bands)
+    skipped = []
+    pending = list(bands)
+    if not force:
+        pending = []
+        with ThreadPoolExecutor(thread_name_prefix="export-check") as pool:
+            checks = pool.map(current_key, bands, bands.values(), repeat(manifest))
+            for path, (key, up_to_date) in zip(bands, checks):
+                keys[path] = key
+                if up_to_date:
+                    skipped.append(path)
+                else:
+                    pending.append(path)
+
+    exported = []
+    if pending:
+        with ProcessPoolExecutor(
+            max_workers=max_workers or os.cpu_count(),
+            initializer=init_worker,
+            initargs=(raw_store,),
+        ) as pool:
+            futures = {
+                pool.submit(
+                    render_preset,
+                    path,
+                    export_dir,
+                    date,
+                    metrics_path,
+                    bands[path],
+                    keys[path],
+                ): path
+                for path in pending
+            }
+            for future in as_completed(futures):
+                preset_path = futures[future]
+                try:
+                    image_path, key = future.result()
+                except Exception as e:
+                    failed.append((preset_path, str(e)))
+                    continue
+                exported.append(image_path)
+                manifest.record(pathlib.Path(preset_path).stem, image_path, key)
+        manifest.save()
+    return exported, skipped, failed
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Render all presets in a directory without the GUI."
+    )
+    parser.add_argument(
+        "presets",
+        nargs="?",
+        default=DEFAULT_PRESET_PATH,
+        help="directory containing preset JSON files",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default=DEFAULT_EXPORT_PATH,
+        help="directory the rendered images are written to",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=None,
+        help="number of worker processes (default: number of CPU cores)",
+    )
+    parser.add_argument(
+        "--metrics",
+        default=None,
+        help="append per-render stage timings to this file as JSON lines",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="render all presets, even if their export is up to date",
+    )
+    parser.add_argument(
+        "--raw-store",
+        action="store_true",
+        help="keep decoded images under cache/raw for later runs",
+    )
+    args = parser.parse_args(argv)
+
+    preset_paths = find_presets(args.presets)
+    if not preset_paths:
+        print(f"No presets found in {args.presets}", file=sys.stderr)
+        return 1
+
+    exported, skipped, failed = render_presets(
+        preset_paths,
+        args.output,
+        args.workers,
+        args.metrics,
+        args.force,
+        args.raw_store,
+    )
+
+    for preset_path, error in failed:
+        print(f"Failed to render {preset_path}: {error}", file=sys.stderr)
+    print(
+        f"Exported {len(exported)} of {len(preset_paths)} presets to {args.output}"
+        f" ({len(skipped)} up to date)"
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,388 @@
+"""Badge browser window.
+
+Shows the badges of the library index as a thumbnail grid with name search
+and folder filter. The grid is virtualized: canvas items only exist for the
+cells in view and are reused while scrolling, so the number of badges in the
+library does not affect how fast the window opens or scrolls.
+"""
+
+import threading
+import tkinter as tk
+from collections import OrderedDict
+from typing import Callable, NamedTuple, Optional
+
+import customtkinter as ctk
+from PIL import ImageTk
+
+from .library import BadgeEntry, BadgeLibrary
+from .polling import Poller
+from .thumbnails import ThumbnailCache
+
+# Space around each thumbnail and below it for the name
+CELL_PADDING = 8
+LABEL_HEIGHT = 18
+# Milliseconds between checks for finished thumbnails and library scans
+POLL_INTERVAL = 30
+# Milliseconds to wait after the last key press before searching
+SEARCH_DELAY = 150
+# PhotoImages kept for cells that scrolled out of view
+PHOTO_CACHE_SIZE = 512
+
+ALL_FOLDERS = "All folders"
+
+
+class Cell(NamedTuple):
+    frame: int
+    image: int
+    label: int
+
+
+class BadgeBrowser(ctk.CTkToplevel):
+    """Window to pick num badges from the library.
+
+    on_select is called with the paths of the chosen badges, relative to the
+    working directory like the paths stored in presets. open_file is called
+    instead if the user prefers the file dialog.
+    """
+
+    def __init__(
+        self,
+        master,
+        library: BadgeLibrary,
+        thumbnails: ThumbnailCache,
+        title: str,
+        num: int,
+        on_select: Callable[[list[str]], None],
+        open_file: Optional[Callable[[], None]] = None,
+        background_width: Optional[int] = None,
+    ):
+        super().__init__(master)
+        self.library = library
+        self.thumbnails = thumbnails
+        self.num = num
+        self.on_select = on_select
+        self.open_file = open_file
+        self.background_width = background_width
+
+        self.__entries: list[BadgeEntry] = []
+        self.__selected: list[str] = []
+        # entry index -> canvas items of the visible cell
+        self.__cells: dict[int, Cell] = {}
+        self.__free_cells: list[Cell] = []
+        self.__photos: OrderedDict[str, ImageTk.PhotoImage] = OrderedDict()
+        self.__columns = 1
+        self.__search_job: Optional[str] = None
+        self.__poller = Poller(self, POLL_INTERVAL, self.__poll)
+        self.__closed = False
+        self.__scan_done = threading.Event()
+        self.__scan_thread = threading.Thread(
+            target=self.__scan, name="badge-scan", daemon=True
+        )
+
+        self.cell_width = thumbnails.size[0] + 2 * CELL_PADDING
+        self.cell_height = thumbnails.size[1] + 2 * CELL_PADDING + LABEL_HEIGHT
+
+        self.title(title)
+        self.geometry("640x560")
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+
+        # Filter
+        self.filter_frame = ctk.CTkFrame(self, fg_color="transparent")
+        self.filter_frame.grid(row=0, column=0, columnspan=2, sticky="ew", padx=10)
+        self.filter_frame.grid_columnconfigure(0, weight=1)
+        self.ent_search = ctk.CTkEntry(self.filter_frame, placeholder_text="Search")
+        self.ent_search.grid(row=0, column=0, sticky="ew", pady=10)
+        self.ent_search.bind("<KeyRelease>", lambda _: self.__schedule_search())
+        self.var_folder = ctk.StringVar(value=ALL_FOLDERS)
+        self.opt_folder = ctk.CTkOptionMenu(
+            self.filter_frame,
+            variable=self.var_folder,
+            values=[ALL_FOLDERS],
+            command=lambda _: self.refresh_entries(),
+        )
+        self.opt_folder.grid(row=0, column=1, padx=(10, 0), pady=10)
+
+        # Grid
+        self.canvas = tk.Canvas(
+            self, highlightthickness=0, background=self.__canvas_color()
+        )
+        self.canvas.grid(row=1, column=0, sticky="nsew", padx=(10, 0))
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.__on_scrollbar)
+        self.scrollbar.grid(row=1, column=1, sticky="ns", padx=(0, 10))
+        self.canvas.configure(yscrollcommand=self.__on_canvas_scroll)
+        self.canvas.bind("<Configure>", lambda _: self.__layout())
+        self.canvas.bind("<MouseWheel>", self.__on_mouse_wheel)
+        self.canvas.bind("<Button-4>", lambda _: self.__scroll(-1))
+        self.canvas.bind("<Button-5>", lambda _: self.__scroll(1))
+
+        # Buttons
+        self.button_frame = ctk.CTkFrame(self, fg_color="transparent")
+        self.button_frame.grid(row=2, column=0, columnspan=2, sticky="ew", padx=10)
+        self.button_frame.grid_columnconfigure(0, weight=1)
+        self.lbl_status = ctk.CTkLabel(self.button_frame, text="", anchor="w")
+        self.lbl_status.grid(row=0, column=0, sticky="ew", pady=10)
+        self.btn_file = ctk.CTkButton(
+            self.button_frame, text="Open File...", width=90, command=self._open_file
+        )
+        self.btn_file.grid(row=0, column=1, padx=(10, 0), pady=10)
+        self.btn_cancel = ctk.CTkButton(
+            self.button_frame, text="Cancel", width=70, command=self.destroy
+        )
+        self.btn_cancel.grid(row=0, column=2, padx=(10, 0), pady=10)
+        self.btn_select = ctk.CTkButton(
+            self.button_frame, text="Select", width=70, command=self._confirm
+        )
+        self.btn_select.grid(row=0, column=3, padx=(10, 0), pady=10)
+
+        # Show the index as it is right away and update it in the background
+        self.refresh_entries()
+        self.__scan_thread.start()
+        self.__start_polling()
+
+        self.after(100, self.ent_search.focus_set)
+        self.transient(master)
+
+    def __canvas_color(self) -> str:
+        color = ctk.ThemeManager.theme["CTkFrame"]["fg_color"]
+        return self._apply_appearance_mode(color)
+
+    # --- Library ---
+
+    def __scan(self):
+        # Runs on a worker thread, only touches the library
+        try:
+            self.library.scan(self.background_width)
+        except Exception as e:
+            print(f"Warning: Could not scan badge library: {e}")
+        self.__scan_done.set()
+
+    def __schedule_search(self):
+        if self.__search_job is not None:
+            self.after_cancel(self.__search_job)
+        self.__search_job = self.after(SEARCH_DELAY, self.refresh_entries)
+
+    def refresh_entries(self, keep_position: bool = False):
+        self.__search_job = None
+        folder = self.var_folder.get()
+        self.__entries = self.library.search(
+            self.ent_search.get().strip(),
+            None if folder == ALL_FOLDERS else folder,
+        )
+        self.opt_folder.configure(
+            values=[ALL_FOLDERS] + [f for f in self.library.folders() if f]
+        )
+        self.thumbnails.cancel_pending()
+        self.__clear_cells()
+        if not keep_position:
+            self.canvas.yview_moveto(0)
+        self.__layout()
+
+    # --- Grid ---
+
+    def __layout(self):
+        width = max(self.canvas.winfo_width(), self.cell_width)
+        columns = max(width // self.cell_width, 1)
+        if columns != self.__columns:
+            self.__columns = columns
+            self.__clear_cells()
+        rows = -(-len(self.__entries) // columns)
+        self.canvas.configure(scrollregion=(0, 0, width, rows * self.cell_height))
+        self.__update_visible()
+        self.__update_status()
+
+    def __visible_range(self) -> range:
+        top = int(self.canvas.canvasy(0))
+        bottom = top + self.canvas.winfo_height()
+        first_row = max(top // self.cell_height, 0)
+        last_row = bottom // self.cell_height
+        start = first_row * self.__columns
+        stop = min((last_row + 1) * self.__columns, len(self.__entries))
+        return range(start, max(stop, start))
+
+    def __update_visible(self):
+        visible = self.__visible_range()
+        for index in [i for i in self.__cells if i not in visible]:
+            cell = self.__cells.pop(index)
+            for item in cell:
+                self.canvas.itemconfigure(item, state="hidden")
+            self.__free_cells.append(cell)
+        for index in visible:
+            if index not in self.__cells:
+                self.__cells[index] = self.__show_cell(index)
+
+    def __clear_cells(self):
+        for cell in self.__cells.values():
+            for item in cell:
+                self.canvas.itemconfigure(item, state="hidden")
+            self.__free_cells.append(cell)
+        self.__cells.clear()
+
+    def __new_cell(self) -> Cell:
+        cell = Cell(
+            self.canvas.create_rectangle(0, 0, 0, 0, width=2, outline=""),
+            self.canvas.create_image(0, 0, anchor="center"),
+            self.canvas.create_text(
+                0, 0, anchor="n", width=self.cell_width - 4, font=("Roboto", 9)
+            ),
+        )
+        for item in cell:
+            self.canvas.tag_bind(
+                item, "<Button-1>", lambda _, c=cell: self.__on_cell_click(c)
+            )
+            self.canvas.tag_bind(
+                item, "<Double-Button-1>", lambda _, c=cell: self.__on_cell_double(c)
+            )
+        return cell
+
+    def __show_cell(self, index: int) -> Cell:
+        cell = self.__free_cells.pop() if self.__free_cells else self.__new_cell()
+        entry = self.__entries[index]
+        row, column = divmod(index, self.__columns)
+        x = column * self.cell_width
+        y = row * self.cell_height
+        self.canvas.coords(
+            cell.frame, x + 2, y + 2, x + self.cell_width - 2, y + self.cell_height - 2
+        )
+        self.canvas.coords(
+            cell.image,
+            x + self.cell_width // 2,
+            y + CELL_PADDING + self.thumbnails.size[1] // 2,
+        )
+        self.canvas.coords(
+            cell.label,
+            x + self.cell_width // 2,
+            y + self.cell_height - LABEL_HEIGHT - CELL_PADDING // 2,
+        )
+        self.canvas.itemconfigure(
+            cell.label, text=entry.name, fill=self.__label_color(entry)
+        )
+        self.canvas.itemconfigure(cell.image, image=self.__photo(entry) or "")
+        for item in cell:
+            self.canvas.itemconfigure(item, state="normal")
+        self.__style_cell(cell, entry)
+        return cell
+
+    def __label_color(self, entry: BadgeEntry) -> str:
+        # Only single badges have to match the background on their own
+        if self.num == 1 and entry.matches_background is False:
+            return "red"
+        return self._apply_appearance_mode(("gray10", "gray90"))
+
+    def __style_cell(self, cell: Cell, entry: BadgeEntry):
+        outline = ""
+        if self.library.preset_path(entry) in self.__selected:
+            color = ctk.ThemeManager.theme["CTkButton"]["fg_color"]
+            outline = self._apply_appearance_mode(color)
+        self.canvas.itemconfigure(cell.frame, outline=outline)
+
+    def __photo(self, entry: BadgeEntry) -> Optional[ImageTk.PhotoImage]:
+        photo = self.__photos.get(entry.digest)
+        if photo is not None:
+            self.__photos.move_to_end(entry.digest)
+            return photo
+        image = self.thumbnails.lookup(entry.digest)
+        if image is None:
+            self.thumbnails.request(entry.digest, self.library.abs_path(entry))
+            self.__start_polling()
+            return None
+        # PhotoImages must be created on the Tk thread
+        photo = ImageTk.PhotoImage(image, master=self.canvas)
+        self.__photos[entry.digest] = photo
+        while len(self.__photos) > PHOTO_CACHE_SIZE:
+            self.__photos.popitem(last=False)
+        return photo
+
+    def __update_status(self):
+        text = f"{len(self.__entries)} badges"
+        if self.num > 1:
+            text += f", {len(self.__selected)} of {self.num} selected"
+        self.lbl_status.configure(text=text)
+        enabled = len(self.__selected) == self.num
+        self.btn_select.configure(state="normal" if enabled else "disabled")
+
+    # --- Polling ---
+
+    def __start_polling(self):
+        self.__poller.start()
+
+    def __poll(self) -> bool:
+        if self.__closed:
+            return False
+        # Read before the results: a scan that ends in between has already
+        # set the event
+        scanning = self.__scan_thread.is_alive()
+        thumbnails, busy = self.thumbnails.poll()
+        finished = {digest for digest, _ in thumbnails}
+        if finished:
+            for index, cell in self.__cells.items():
+                entry = self.__entries[index]
+                if entry.digest in finished:
+                    self.canvas.itemconfigure(
+                        cell.image, image=self.__photo(entry) or ""
+                    )
+        if self.__scan_done.is_set():
+            self.__scan_done.clear()
+            # Requests thumbnails for the new entries, busy is outdated
+            self.refresh_entries(keep_position=True)
+            return True
+        return busy or scanning
+
+    # --- Events ---
+
+    def __on_scrollbar(self, *args):
+        self.canvas.yview(*args)
+
+    def __on_canvas_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.__update_visible()
+
+    def __scroll(self, units: int):
+        self.canvas.yview_scroll(units, "units")
+
+    def __on_mouse_wheel(self, event):
+        self.__scroll(-1 if event.delta > 0 else 1)
+
+    def __index_of(self, cell: Cell) -> Optional[int]:
+        for index, visible_cell in self.__cells.items():
+            if visible_cell == cell:
+                return index
+        return None
+
+    def __on_cell_click(self, cell: Cell):
+        index = self.__index_of(cell)
+        if index is None:
+            return
+        path = self.library.preset_path(self.__entries[index])
+        if path in self.__selected:
+            self.__selected.remove(path)
+        elif self.num == 1:
+            self.__selected = [path]
+        elif len(self.__selected) < self.num:
+            self.__selected.append(path)
+        for i, c in self.__cells.items():
+            self.__style_cell(c, self.__entries[i])
+        self.__update_status()
+
+    def __on_cell_double(self, cell: Cell):
+        index = self.__index_of(cell)
+        if self.num == 1 and index is not None:
+            self.__selected = [self.library.preset_path(self.__entries[index])]
+            self._confirm()
+
+    def _confirm(self):
+        if len(self.__selected) != self.num:
+            return
+        selected = list(self.__selected)
+        self.destroy()
+        self.on_select(selected)
+
+    def _open_file(self):
+        self.destroy()
+        if self.open_file is not None:
+            self.open_file()
+
+    def destroy(self):
+        self.__closed = True
+        self.thumbnails.cancel_pending()
+        super().destroy()
@@ -0,0 +1,157 @@
+"""Detection of the buttonhole ("Knopfloch") the name is stamped into.
+
+The buttonhole is the largest connected transparent area of a background.
+Detection results are cached in memory and in sidecar files under the cache
+folder, keyed by the content hash of the background file, so a known
+background never has to be labeled again.
+"""
+
+import json
+import os
+import threading
+from typing import Optional
+
+from PIL import Image
+
+from .cache import atomic_write
+from .config import DEFAULT_CACHE_PATH
+
+BBox = tuple[int, int, int, int]
+# bbox and mask of the buttonhole, None if the background has none
+Buttonhole = Optional[tuple[BBox, Image.Image]]
+
+CACHE_VERSION = 1
+DEFAULT_BUTTONHOLE_CACHE_PATH = os.path.join(DEFAULT_CACHE_PATH, "buttonholes")
+
+# Alpha values below this count as transparent
+ALPHA_THRESHOLD = 20
+
+
+def detect_buttonhole(background: Image.Image) -> Buttonhole:
+    """Find the largest connected transparent area of an RGBA image."""
+    # Imported lazily, they are only needed for backgrounds not in the cache
+    import cv2
+    import numpy as np
+
+    alpha = background.split()[3]
+    img_array = np.array(alpha)
+
+    # 2. Threshold to ensure we only have pure white (255) vs the rest
+    # If your "white" isn't perfect, you can adjust the threshold value
+    _, binary = cv2.threshold(
+        img_array, ALPHA_THRESHOLD, 255, cv2.THRESH_BINARY_INV
+    )
+
+    # 3. Find connected components
+    # connectivity=8 includes diagonals; connectivity=4 does not
+    num_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(
+        binary, connectivity=8
+    )
+
+    # If only background is found (num_labels = 1), return None
+    if num_labels < 2:
+        return None
+
+    # 4. Filter out the background label (always index 0) and find the largest area
+    # stats[label, cv2.CC_STAT_AREA] gives the pixel count
+    largest_label = 1 + np.argmax(stats[1:, cv2.CC_STAT_AREA])
+
+    # 5. Extract bounding box coordinates for the largest label
+    # stats contains [left, top, width, height, area]
+    x = int(stats[largest_label, cv2.CC_STAT_LEFT])
+    y = int(stats[largest_label, cv2.CC_STAT_TOP])
+    w = int(stats[largest_label, cv2.CC_STAT_WIDTH])
+    h = int(stats[largest_label, cv2.CC_STAT_HEIGHT])
+    bbox = (x, y, w + x, h + y)
+
+    alpha_crop = alpha.crop(bbox)
+    mask = alpha_crop.point(
+        lambda p: 255 if p < ALPHA_THRESHOLD else 0  # pyright: ignore[reportOperatorIssue]
+    )
+    return bbox, mask
+
+
+class ButtonholeCache:
+    """Detection results keyed by the content hash of the background file.
+
+    Each result is stored as <digest>.json with the bbox and, if there is a
+    buttonhole, <digest>.png with its mask.
+    """
+
+    def __init__(self, path: str = DEFAULT_BUTTONHOLE_CACHE_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.__memory: dict[str, Buttonhole] = {}
+        self.__lock = threading.Lock()
+
+    def get(self, digest: str, background: Image.Image) -> Buttonhole:
+        with self.__lock:
+            if digest in self.__memory:
+                self.hits += 1
+                return self.__memory[digest]
+
+        result = self.__load(digest)
+        if result is False:
+            with self.__lock:
+                self.misses += 1
+            result = detect_buttonhole(background)
+            self.__store(digest, result)
+        else:
+            with self.__lock:
+                self.hits += 1
+
+        with self.__lock:
+            self.__memory[digest] = result
+        return result
+
+    def invalidate(self, digest: str):
+        with self.__lock:
+            self.__memory.pop(digest, None)
+
+    def clear(self):
+        """Forget all results held in memory, the sidecar files are kept."""
+        with self.__lock:
+            self.__memory.clear()
+
+    def __files(self, digest: str) -> tuple[str, str]:
+        base = os.path.join(self.path, digest)
+        return base + ".json", base + ".png"
+
+    def __load(self, digest: str) -> Buttonhole | bool:
+        """Return the cached result, or False if there is none."""
+        json_path, mask_path = self.__files(digest)
+        try:
+            with open(json_path, "r") as f:
+                data = json.load(f)
+            if data.get("version") != CACHE_VERSION:
+                return False
+            if data["bbox"] is None:
+                return None
+            with Image.open(mask_path) as mask:
+                mask.load()
+            return tuple(data["bbox"]), mask  # pyright: ignore[reportReturnType]
+        except (OSError, ValueError, KeyError):
+            return False
+
+    def __store(self, digest: str, result: Buttonhole):
+        json_path, mask_path = self.__files(digest)
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            # Batch workers may race on these files
+            if result is not None:
+                with atomic_write(mask_path) as f:
+                    result[1].save(f, format="PNG")
+            with atomic_write(json_path, "w") as f:
+                json.dump(
+                    {
+                        "version": CACHE_VERSION,
+                        "bbox": None if result is None else list(result[0]),
+                    },
+                    f,
+                )
+        except OSError as e:
+            print(f"Warning: Could not write buttonhole cache: {e}")
+
+
+buttonhole_cache = ButtonholeCache()
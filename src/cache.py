@@ -0,0 +1,324 @@
+import hashlib
+import os
+import struct
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import IO, TYPE_CHECKING, Callable, Hashable, Iterable, Iterator, Optional
+
+from PIL import Image
+
+if TYPE_CHECKING:
+    from .rawstore import RawImageStore
+
+# Default memory budget for decoded images (RGBA, 4 bytes per pixel)
+DEFAULT_IMAGE_CACHE_BYTES = 256 * 1024 * 1024
+# Threads decoding prefetched images. Pillow releases the GIL while
+# decoding, and more threads than cores hide the latency of network shares
+PREFETCH_WORKERS = 8
+
+StatKey = tuple[str, int, int]
+
+
+def stat_key(path: str) -> StatKey:
+    """Return (absolute path, mtime, size) for a file.
+
+    Raises FileNotFoundError if the file does not exist.
+    """
+    abs_path = os.path.abspath(path)
+    st = os.stat(abs_path)
+    return abs_path, st.st_mtime_ns, st.st_size
+
+
+# absolute path -> (stat key, digest) of the last hashed version
+_digests: dict[str, tuple[StatKey, str]] = {}
+_digests_lock = threading.Lock()
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 hex digest of a file's content.
+
+    Digests are remembered per (path, mtime, size), so unchanged files are
+    only read once per process.
+    """
+    key = stat_key(path)
+    with _digests_lock:
+        cached = _digests.get(key[0])
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    with open(key[0], "rb") as f:
+        digest = hashlib.file_digest(f, "sha256").hexdigest()
+    with _digests_lock:
+        _digests[key[0]] = (key, digest)
+    return digest
+
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# absolute path -> (stat key, (width, height)) of the last read version
+_dimensions: dict[str, tuple[StatKey, tuple[int, int]]] = {}
+_dimensions_lock = threading.Lock()
+
+
+def _read_dimensions(abs_path: str) -> tuple[int, int]:
+    with open(abs_path, "rb") as f:
+        header = f.read(24)
+    # Signature, then the IHDR chunk (length, type, width, height)
+    if header[:8] == PNG_SIGNATURE and header[12:16] == b"IHDR":
+        return struct.unpack(">II", header[16:24])
+    # Other formats: Image.open only parses the header as well
+    with Image.open(abs_path) as image:
+        return image.size
+
+
+def image_dimensions(path: str) -> tuple[int, int]:
+    """(width, height) of an image file without decoding its pixels.
+
+    Remembered per (path, mtime, size) like file_digest. Raises
+    FileNotFoundError if the file does not exist.
+    """
+    key = stat_key(path)
+    with _dimensions_lock:
+        cached = _dimensions.get(key[0])
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    size = _read_dimensions(key[0])
+    with _dimensions_lock:
+        _dimensions[key[0]] = (key, size)
+    return size
+
+
+def is_within(abs_path: str, changed: str) -> bool:
+    """True if abs_path is the changed path or lies below it."""
+    return abs_path == changed or abs_path.startswith(changed.rstrip(os.sep) + os.sep)
+
+
+def forget_files(path: str) -> list[str]:
+    """Forget the memoized digest and dimensions of a file.
+
+    A directory forgets everything below it. Returns the digests that were
+    known, so results cached by content can be dropped as well.
+    """
+    changed = os.path.abspath(path)
+    with _digests_lock:
+        forgotten = [p for p in _digests if is_within(p, changed)]
+        digests = [_digests.pop(p)[1] for p in forgotten]
+    with _dimensions_lock:
+        for p in [p for p in _dimensions if is_within(p, changed)]:
+            del _dimensions[p]
+    return digests
+
+
+@contextmanager
+def atomic_write(path: str, mode: str = "wb") -> Iterator[IO]:
+    """Open a temporary file that replaces path when the block completes.
+
+    Readers never see a partial file. The temporary name is unique per
+    process and thread, since batch workers may write the same file, and
+    the temporary file is removed if the block or the replace fails.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, mode) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def image_size_in_bytes(image: Image.Image) -> int:
+    return image.width * image.height * len(image.getbands())
+
+
+class ImageLRU:
+    """Thread-safe LRU mapping of keys to images with a byte budget."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.__entries: OrderedDict[Hashable, Image.Image] = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __contains__(self, key: Hashable):
+        return key in self.__entries
+
+    def lookup(self, key: Hashable) -> Optional[Image.Image]:
+        with self._lock:
+            image = self.__entries.get(key)
+            if image is None:
+                self.misses += 1
+                return None
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            return image
+
+    def put(self, key: Hashable, image: Image.Image):
+        with self._lock:
+            self.remove(key)
+            size = image_size_in_bytes(image)
+            if size > self.max_bytes:
+                # Larger than the whole budget, do not evict everything for it
+                return
+            self.__entries[key] = image
+            self.current_bytes += size
+            self.__evict()
+
+    def remove(self, key: Optional[Hashable]):
+        with self._lock:
+            image = self.__entries.pop(key, None)
+            if image is not None:
+                self.current_bytes -= image_size_in_bytes(image)
+                self._on_remove(key)
+
+    def remove_matching(self, predicate: Callable[[Hashable], bool]):
+        with self._lock:
+            for key in [k for k in self.__entries if predicate(k)]:
+                self.remove(key)
+
+    def _on_remove(self, key: Hashable):
+        pass
+
+    def __evict(self):
+        while self.current_bytes > self.max_bytes and self.__entries:
+            self.remove(next(iter(self.__entries)))
+
+    def set_max_bytes(self, max_bytes: int):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self.__evict()
+
+    def clear(self):
+        with self._lock:
+            for key in list(self.__entries):
+                self.remove(key)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.__entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class ImageCache(ImageLRU):
+    """Process-wide LRU cache of decoded RGBA images.
+
+    Entries are keyed by absolute path, mtime and size, so an edited file is
+    decoded again on the next access. The cached images are shared between
+    callers and must be treated as read-only.
+
+    With a raw store, decoded pixels are also kept on disk and mapped by
+    later processes instead of decoding the file again. The store is off
+    by default; batch and sheet enable it in their workers on request.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_IMAGE_CACHE_BYTES,
+        raw_store: Optional["RawImageStore"] = None,
+    ):
+        super().__init__(max_bytes)
+        # Decoded pixels on disk, shared with other processes
+        self.raw_store = raw_store
+        # absolute path -> key of the most recent version in the cache
+        self.__paths: dict[str, StatKey] = {}
+        # Decodes started by prefetch that have not finished
+        self.__pending: dict[StatKey, Future] = {}
+        self.__pool: Optional[ThreadPoolExecutor] = None
+
+    def get(self, path: str) -> Image.Image:
+        """Decoded image of a file, waiting for it if it is being prefetched."""
+        key = stat_key(path)
+        with self._lock:
+            future = self.__pending.get(key)
+            image = self.lookup(key) if future is None else None
+        if future is not None:
+            return future.result()
+        if image is not None:
+            return image
+        return self.__load(key)
+
+    def prefetch(self, paths: Iterable[str]) -> list[Future]:
+        """Start decoding files that are not cached on a thread pool.
+
+        Missing files are ignored; get() reports them. Returns the futures
+        of the decodes, which get() also waits on.
+        """
+        futures = []
+        for path in dict.fromkeys(paths):
+            try:
+                key = stat_key(path)
+            except OSError:
+                continue
+            with self._lock:
+                if key in self:
+                    continue
+                future = self.__pending.get(key)
+                if future is None:
+                    if self.__pool is None:
+                        self.__pool = ThreadPoolExecutor(
+                            PREFETCH_WORKERS, thread_name_prefix="image-prefetch"
+                        )
+                    future = self.__pool.submit(self.__load, key)
+                    self.__pending[key] = future
+            futures.append(future)
+        return futures
+
+    def __load(self, key: StatKey) -> Image.Image:
+        try:
+            image = self._decode(key[0])
+        except BaseException:
+            with self._lock:
+                self.__pending.pop(key, None)
+            raise
+
+        with self._lock:
+            # An older version of the same file can never be hit again
+            self.remove(self.__paths.get(key[0]))
+            self.put(key, image)
+            if key in self:
+                self.__paths[key[0]] = key
+            # Stored before the decode stops being pending, so get() finds
+            # the image in one of both
+            self.__pending.pop(key, None)
+        return image
+
+    def _decode(self, abs_path: str) -> Image.Image:
+        if self.raw_store is None:
+            return self.__decode_file(abs_path)
+        digest = file_digest(abs_path)
+        image = self.raw_store.load(digest)
+        if image is None:
+            image = self.__decode_file(abs_path)
+            self.raw_store.store(digest, image)
+        return image
+
+    def __decode_file(self, abs_path: str) -> Image.Image:
+        with Image.open(abs_path) as image:
+            return image.convert("RGBA")
+
+    def _on_remove(self, key: Hashable):
+        assert isinstance(key, tuple)
+        if self.__paths.get(key[0]) == key:
+            del self.__paths[key[0]]
+
+    def invalidate(self, path: str):
+        """Drop every cached version of the given file."""
+        self.remove(self.__paths.get(os.path.abspath(path)))
+
+
+image_cache = ImageCache()
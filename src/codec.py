@@ -0,0 +1,150 @@
+"""Preset encoder and decoder.
+
+Hand-written replacement for the dataclasses_json round trip of
+LeatherBand, which is slow when thousands of presets are loaded. The JSON
+layout is unchanged apart from a "version" key; files without one are
+version 1, and dataclasses_json ignores the key when reading new files.
+"""
+
+import json
+import os
+import pathlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, NamedTuple, Optional
+
+from .models import Badge, BadgeRow, LeatherBand
+
+SCHEMA_VERSION = 1
+
+
+class PresetError(ValueError):
+    pass
+
+
+class LoadedPreset(NamedTuple):
+    path: str
+    band: Optional[LeatherBand]
+    error: Optional[Exception]
+
+
+def _expect(value: Any, kind: type, field: str) -> Any:
+    # bool is an int, but never a valid margin
+    if not isinstance(value, kind) or (kind is int and isinstance(value, bool)):
+        raise PresetError(
+            f"{field} must be of type {kind.__name__}, not {type(value).__name__}"
+        )
+    return value
+
+
+def _int(value: Any, field: str) -> int:
+    # dataclasses_json accepted integral floats, e.g. "margin": 6.0
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return _expect(value, int, field)
+
+
+def _str(value: Any, field: str) -> str:
+    # dataclasses_json kept null paths, which behave like empty ones
+    if value is None:
+        return ""
+    return _expect(value, str, field)
+
+
+def _decode_badge(data: Any, field: str) -> Badge:
+    _expect(data, dict, field)
+    return Badge(_str(data.get("image_path", ""), f"{field}.image_path"))
+
+
+def _decode_item(data: Any, field: str) -> Badge | BadgeRow:
+    _expect(data, dict, field)
+    # Same rule as models.union_decoder
+    if "badges" in data:
+        badges = _expect(data["badges"], list, f"{field}.badges")
+        return BadgeRow(
+            [
+                _decode_badge(badge, f"{field}.badges[{index}]")
+                for index, badge in enumerate(badges)
+            ]
+        )
+    return _decode_badge(data, field)
+
+
+def decode_band(data: Any) -> LeatherBand:
+    """Build a LeatherBand from parsed preset JSON.
+
+    Raises PresetError for data that does not match the schema.
+    """
+    _expect(data, dict, "preset")
+    version = _int(data.get("version", 1), "version")
+    if version > SCHEMA_VERSION:
+        raise PresetError(
+            f"Preset version {version} is newer than supported ({SCHEMA_VERSION})"
+        )
+    band = LeatherBand()
+    band.image_path = _str(data.get("image_path", ""), "image_path")
+    band.margin = _int(data.get("margin", band.margin), "margin")
+    badges = _expect(data.get("badges", []), list, "badges")
+    band.badges = [
+        _decode_item(item, f"badges[{index}]") for index, item in enumerate(badges)
+    ]
+    return band
+
+
+def encode_band(band: LeatherBand) -> dict:
+    """Preset JSON data of a LeatherBand, the inverse of decode_band."""
+    return {
+        "version": SCHEMA_VERSION,
+        "image_path": band.image_path,
+        "margin": band.margin,
+        "badges": [
+            {"badges": [{"image_path": b.image_path} for b in item.badges]}
+            if isinstance(item, BadgeRow)
+            else {"image_path": item.image_path}
+            for item in band.badges
+        ],
+    }
+
+
+def loads(text: str | bytes) -> LeatherBand:
+    try:
+        data = json.loads(text)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        # Bytes that are not UTF-8 raise UnicodeDecodeError instead
+        raise PresetError(f"Invalid preset JSON: {e}") from e
+    return decode_band(data)
+
+
+def dumps(band: LeatherBand) -> str:
+    return json.dumps(encode_band(band))
+
+
+def load_preset(path: str) -> LoadedPreset:
+    """Load one preset, returning the error instead of raising it."""
+    try:
+        with open(path, "rb") as f:
+            return LoadedPreset(path, loads(f.read()), None)
+    except (OSError, PresetError) as e:
+        return LoadedPreset(path, None, e)
+
+
+def load_presets(
+    paths: list[str], max_workers: Optional[int] = None
+) -> list[LoadedPreset]:
+    """Load many presets in parallel, in the order of paths.
+
+    Reading is I/O bound and runs on a thread pool. Presets that fail to
+    load are returned with their error.
+    """
+    if len(paths) < 2:
+        return [load_preset(path) for path in paths]
+    workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+    with ThreadPoolExecutor(workers, thread_name_prefix="preset-loader") as pool:
+        return list(pool.map(load_preset, paths))
+
+
+def load_preset_dir(
+    preset_dir: str, max_workers: Optional[int] = None
+) -> list[LoadedPreset]:
+    """Load all preset files of a directory, sorted by path."""
+    paths = sorted(str(path) for path in pathlib.Path(preset_dir).glob("*.json"))
+    return load_presets(paths, max_workers)
@@ -0,0 +1,42 @@
+import numpy as np
+from PIL import Image
+
+# (layer image, x, y) of a layer placed on the canvas
+Layer = tuple[Image.Image, int, int]
+
+
+def _premultiply(rgba: np.ndarray) -> np.ndarray:
+    out = rgba.astype(np.float32) / 255.0
+    out[..., :3] *= out[..., 3:4]
+    return out
+
+
+def composite_layers(base: Image.Image, layers: list[Layer]) -> Image.Image:
+    """Composite RGBA layers over base in a single pass.
+
+    The canvas is kept as one preallocated premultiplied float array. Each
+    layer is blended with the "over" operator into the rows and columns it
+    covers only; parts of layers outside the canvas are clipped.
+    """
+    canvas = _premultiply(np.asarray(base.convert("RGBA")))
+    height, width = canvas.shape[:2]
+
+    for image, x, y in layers:
+        top, bottom = max(y, 0), min(y + image.height, height)
+        left, right = max(x, 0), min(x + image.width, width)
+        if top >= bottom or left >= right:
+            continue
+
+        src = np.asarray(image)[top - y : bottom - y, left - x : right - x]
+        src = _premultiply(src)
+        dst = canvas[top:bottom, left:right]
+        dst *= 1.0 - src[..., 3:4]
+        dst += src
+
+    alpha = canvas[..., 3:4]
+    rgb = np.divide(
+        canvas[..., :3], alpha, out=np.zeros_like(canvas[..., :3]), where=alpha > 0
+    )
+    canvas[..., :3] = rgb
+    out = np.clip(canvas * 255.0 + 0.5, 0, 255).astype(np.uint8)
+    return Image.fromarray(out)
@@ -0,0 +1,13 @@
+import os
+
+DEFAULT_PRESET_PATH = os.path.join(os.getcwd(), "presets/")
+DEFAULT_EXPORT_PATH = os.path.join(os.getcwd(), "output/")
+DEFAULT_BADGE_PATH = os.path.join(os.getcwd(), "input/badges/")
+DEFAULT_BACKGROUND_PATH = os.path.join(os.getcwd(), "input/backgrounds/")
+DEFAULT_CACHE_PATH = os.path.join(os.getcwd(), "cache/")
+
+EXPORT_DATE_FORMAT = "%Y-%m-%d"
+
+
+def export_file_name(date: str, preset_name: str) -> str:
+    return f"{date} {preset_name}.png"
@@ -1,30 +1,133 @@
 import os
-from typing import Optional
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, NamedTuple, Optional
 
-import cv2
-import numpy as np
-from PIL import Image, ImageChops, ImageDraw, ImageFont
+from PIL import Image, ImageChops
 
+from .buttonhole import buttonhole_cache
+from .cache import file_digest, image_size_in_bytes
+from .exports import render_key
+from .metrics import Metrics
 from .models import Badge, BadgeRow, LeatherBand
+from .scaling import scale_to_width, scaled_layer_cache
+from .text import get_glyph_atlas, name_layer_cache
+
+if TYPE_CHECKING:
+    from .compositor import Layer
+
+
+# FONT_PATH = os.path.join(os.path.dirname(__file__), "font", "PixelOperator.ttf")
+# FONT_PATH = os.path.join(os.path.dirname(__file__), "font", "W95FA.otf")
+FONT_PATH = os.path.join(os.path.dirname(__file__), "font", "PIXEARG_.TTF")
+FONT_SIZE = 8
+
+# Compositor backends for create_band_image
+COMPOSITOR_PIL = "pil"
+COMPOSITOR_NUMPY = "numpy"
+
+# Snapshot budget for interactive engines, see Engine
+PREVIEW_SNAPSHOT_BYTES = 64 * 1024 * 1024
+
+# Stage context used when instrumentation is off
+_NO_METRICS = nullcontext()
+
+
+class LayerSnapshot(NamedTuple):
+    """Composite state right after a badge layer has been placed."""
+
+    key: tuple
+    # None for layers between the stored snapshots
+    image: Optional[Image.Image]
+    top_y: int
+
+
+class NameTemplate:
+    """A band without a name, for stamping many names into the buttonhole.
+
+    Only the buttonhole region is composed for each name: the background
+    below it, the name and the parts of the badge layers covering it. The
+    result is written into image, which is reused by every stamp.
+    """
+
+    def __init__(
+        self,
+        image: Image.Image,
+        bbox: tuple[int, int, int, int],
+        background: Image.Image,
+        overlays: list[tuple[Image.Image, tuple[int, int]]],
+    ):
+        self.image = image
+        self.bbox = bbox
+        # Background within bbox
+        self.__background = background
+        # Parts of the badge layers within bbox, relative to its corner
+        self.__overlays = overlays
+
+    def stamp(self, name_image: Optional[Image.Image]) -> Image.Image:
+        region = self.__background.copy()
+        if name_image is not None:
+            region.alpha_composite(name_image)
+        for layer, offset in self.__overlays:
+            region.alpha_composite(layer, offset)
+        self.image.paste(region, self.bbox[:2])
+        return self.image
 
 
 class Engine:
-    def __init__(self, band: LeatherBand):
+    def __init__(
+        self,
+        band: LeatherBand,
+        compositor: str = COMPOSITOR_PIL,
+        metrics: Optional[Metrics] = None,
+        snapshot_bytes: int = 0,
+    ):
+        """snapshot_bytes limits the layer snapshots kept per render width.
+
+        Snapshots only pay off when the same band is rendered again after an
+        edit, e.g. for the preview; with 0, one-shot renders keep none.
+        """
         self.__name: str = ""
         self.__name_image: Optional[Image.Image] = None
         self.__name_image_bbox: Optional[tuple[int, int, int, int]] = None
         self.__name_image_mask: Image.Image = Image.new("L", (1, 1), 0)
         self.__background_image: Optional[Image.Image] = None
+        self.__background_digest: Optional[str] = None
         self.__band: LeatherBand = band
-
-        # font_path = os.path.join(os.path.dirname(__file__), "font", "PixelOperator.ttf")
-        # font_path = os.path.join(os.path.dirname(__file__), "font", "W95FA.otf")
-        font_path = os.path.join(os.path.dirname(__file__), "font", "PIXEARG_.TTF")
-        self.font_size = 8
-        self.font = ImageFont.truetype(font_path, self.font_size)
+        self.compositor = compositor
+        self.metrics = metrics
+
+        # Incremented whenever the background or the name layer changes, which
+        # invalidates all layer snapshots and proxies
+        self.__base_version: int = 0
+        self.__snapshots_base_version: int = -1
+        self.snapshot_bytes = snapshot_bytes
+        # render width -> snapshots after each layer
+        self.__layer_snapshots: dict[int, list[LayerSnapshot]] = {}
+        # render width -> background with the name composited
+        self.__base_images: dict[int, Image.Image] = {}
+
+        self.font_size = FONT_SIZE
+        # The font itself is only loaded once a name is rendered
+        self.glyph_atlas = get_glyph_atlas(FONT_PATH, self.font_size)
+
+    @property
+    def name(self) -> str:
+        return self.__name
+
+    @property
+    def font(self):
+        return self.glyph_atlas.font
+
+    def __stage(self, stage: str):
+        if self.metrics is None:
+            return _NO_METRICS
+        return self.metrics.stage(stage)
 
     def set_band(self, band: LeatherBand):
         self.__band = band
+        # Badges decode while the background is processed, the first render
+        # only waits for the images it uses
+        band.prefetch_images()
         self.update_background()
 
     def set_name(self, name: str):
@@ -35,7 +138,8 @@ class Engine:
     def update_background(
         self,
     ):
-        self.__background_image = self.__band.get_image()
+        with self.__stage("decode"):
+            self.__background_image = self.__band.get_image()
         self.__generate_name_image_mask()
         self.__generate_name_image()
 
@@ -44,40 +148,16 @@ class Engine:
             self.__name_image_bbox = None
             return
 
-        alpha = self.__background_image.split()[3]
-        img_array = np.array(alpha)
-
-        # 2. Threshold to ensure we only have pure white (255) vs the rest
-        # If your "white" isn't perfect, you can adjust the threshold value
-        _, binary = cv2.threshold(img_array, 20, 255, cv2.THRESH_BINARY_INV)
-
-        # 3. Find connected components
-        # connectivity=8 includes diagonals; connectivity=4 does not
-        num_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(
-            binary, connectivity=8
-        )
-
-        # If only background is found (num_labels = 1), return None
-        if num_labels < 2:
+        with self.__stage("mask_detection"):
+            self.__background_digest = file_digest(self.__band.image_path)
+            buttonhole = buttonhole_cache.get(
+                self.__background_digest, self.__background_image
+            )
+        if buttonhole is None:
             self.__name_image_bbox = None
             return None
 
-        # 4. Filter out the background label (always index 0) and find the largest area
-        # stats[label, cv2.CC_STAT_AREA] gives the pixel count
-        largest_label = 1 + np.argmax(stats[1:, cv2.CC_STAT_AREA])
-
-        # 5. Extract bounding box coordinates for the largest label
-        # stats contains [left, top, width, height, area]
-        x = stats[largest_label, cv2.CC_STAT_LEFT]
-        y = stats[largest_label, cv2.CC_STAT_TOP]
-        w = stats[largest_label, cv2.CC_STAT_WIDTH]
-        h = stats[largest_label, cv2.CC_STAT_HEIGHT]
-        self.__name_image_bbox = (x, y, w + x, h + y)
-
-        alpha_crop = alpha.crop(self.__name_image_bbox)
-        self.__name_image_mask = alpha_crop.point(
-            lambda p: 255 if p < 20 else 0  # pyright: ignore[reportOperatorIssue]
-        )
+        self.__name_image_bbox, self.__name_image_mask = buttonhole
 
     def __generate_name_image(self):
         if (
@@ -87,6 +167,7 @@ class Engine:
             or self.__name == ""
         ):
             self.__name_image = None
+            self.__base_version += 1
             return
 
         w, h = (
@@ -99,35 +180,56 @@ class Engine:
             rotate = True
             w, h = h, w
 
-        name_image = Image.new("RGBA", (w, h), (255, 255, 255, 255))
-        draw = ImageDraw.Draw(name_image)
-        draw.fontmode = "1"
+        key = (
+            self.glyph_atlas.font_path,
+            self.font_size,
+            self.__name,
+            self.__name_image_bbox,
+            rotate,
+            self.__background_digest,
+        )
+        name_image = name_layer_cache.lookup(key)
+        if name_image is not None:
+            self.__name_image = name_image
+            self.__base_version += 1
+            return
 
-        # Draw the name text on the name image
-        bbox = draw.textbbox((20, 20), self.__name, font=self.font)
-        text_width = bbox[2] - bbox[0]
-        text_y = (h - self.font_size) // 2
-        text_x = max((w - text_width) // 2, 1)
-        draw.text((text_x, text_y), self.__name, font=self.font, fill=(0, 0, 0, 255))
+        with self.__stage("name_rasterization"):
+            name_image = Image.new("RGBA", (w, h), (255, 255, 255, 255))
 
-        # Rotate the name image if necessary
-        if rotate:
-            name_image = name_image.rotate(90, expand=True)
+            # Draw the name text on the name image
+            text_width = self.glyph_atlas.text_width(self.__name)
+            text_y = (h - self.font_size) // 2
+            text_x = max((w - text_width) // 2, 1)
+            self.glyph_atlas.draw_text(
+                name_image, (text_x, text_y), self.__name, fill=(0, 0, 0, 255)
+            )
 
-        # Ensure mask is the same size as name_image (should be guaranteed by logic, but good for safety)
-        a = name_image.split()[3]
-        new_a = ImageChops.multiply(a, self.__name_image_mask)
-        name_image.putalpha(new_a)
+            # Rotate the name image if necessary
+            if rotate:
+                name_image = name_image.rotate(90, expand=True)
 
+            # Ensure mask is the same size as name_image (should be guaranteed by logic, but good for safety)
+            a = name_image.split()[3]
+            new_a = ImageChops.multiply(a, self.__name_image_mask)
+            name_image.putalpha(new_a)
+
+        name_layer_cache.put(key, name_image)
         self.__name_image = name_image
+        self.__base_version += 1
 
     def __create_badge_row_image(self, badge_row: BadgeRow):
+        with self.__stage("row_assembly"):
+            return self.__assemble_badge_row_image(badge_row)
+
+    def __assemble_badge_row_image(self, badge_row: BadgeRow):
         images = []
         width = 0
         max_height = 0
 
         for index, badge in enumerate(badge_row.badges):
-            image = badge.get_image()
+            with self.__stage("decode"):
+                image = badge.get_image()
             if image is None:
                 print(f"Warning: Badge image not found: {badge.image_path}")
                 continue
@@ -153,78 +255,198 @@ class Engine:
         if badge.scale_warning_showed:
             return None
 
+        # Only the PNG header is read, the badge is not decoded
         try:
-            image = badge.get_image()
+            width, _ = badge.get_image_size()
         except FileNotFoundError as e:
-            return f"Badge image not found: {e}"
+            return str(e)
         except Exception as e:
             return f"Error loading badge image: {e}"
 
         if self.__background_image is None:
             return None
 
-        if image.width != self.__background_image.width:
+        if width != self.__background_image.width:
             badge.scale_warning_showed = True
-            return f"Badge {badge.name}:\nWidth ({image.width}) does not match background image width ({self.__background_image.width})"
+            return f"Badge {badge.name}:\nWidth ({width}) does not match background image width ({self.__background_image.width})"
 
     def check_badge_row_scaling(self, row: BadgeRow) -> Optional[str]:
         if row.scale_warning_showed:
             return None
 
-        width = 0
+        widths = []
         for badge in row.badges:
             try:
-                image = badge.get_image()
+                widths.append(badge.get_image_size()[0])
             except FileNotFoundError as e:
-                return f"Badge image not found: {e}"
+                return str(e)
             except Exception as e:
                 return f"Error loading badge image: {e}"
-            width += image.width
 
-        if len(row.badges) > 1:
-            width -= 2 * (len(row.badges) - 1)
+        # Badges in a row overlap by one pixel column at each seam, see
+        # __assemble_badge_row_image
+        seams = max(len(widths) - 1, 0)
+        width = sum(widths) - 2 * seams
 
         if self.__background_image is None:
             return None
 
         if width != self.__background_image.width:
             row.scale_warning_showed = True
-            return f"Row {row.name}:\nWidth ({width}) does not match background image width ({self.__background_image.width})"
-
-    def create_band_image(self) -> Optional[Image.Image]:
-        if self.__band is None or self.__background_image is None:
-            return None
-
-        background = self.__background_image.copy()
-
-        if self.__name_image is not None and self.__name_image_bbox is not None:
-            background.alpha_composite(
-                self.__name_image,
-                (self.__name_image_bbox[0], self.__name_image_bbox[1]),
+            arithmetic = " + ".join(str(w) for w in widths)
+            if seams:
+                arithmetic += f" - {2 * seams} = {width}"
+            return f"Row {row.name}:\nWidth ({arithmetic}) does not match background image width ({self.__background_image.width})"
+
+    def __layer_source_key(self, badge: Badge | BadgeRow) -> tuple:
+        if isinstance(badge, Badge):
+            return (Badge, badge.get_image_key())
+        return (BadgeRow, tuple(b.get_image_key() for b in badge.badges))
+
+    def __create_layer_image(self, badge: Badge | BadgeRow) -> Image.Image:
+        if isinstance(badge, BadgeRow):
+            return self.__create_badge_row_image(badge)
+        with self.__stage("decode"):
+            return badge.get_image()
+
+    def __get_layer_image(
+        self, badge: Badge | BadgeRow, source_key: tuple, width: int
+    ) -> Image.Image:
+        """Layer image scaled to width. Read-only."""
+        key = (source_key, width)
+        image = scaled_layer_cache.lookup(key)
+        if image is None:
+            image = self.__create_layer_image(badge)
+            with self.__stage("resize"):
+                image = scale_to_width(image, width)
+            scaled_layer_cache.put(key, image)
+        return image
+
+    def __get_render_width(self, max_size: Optional[tuple[int, int]]) -> int:
+        assert self.__background_image is not None
+        bg_width, bg_height = self.__background_image.size
+        if max_size is None:
+            return bg_width
+        factor = min(1.0, max_size[0] / bg_width, max_size[1] / bg_height)
+        return max(1, int(bg_width * factor))
+
+    def __get_base_image(self, width: int) -> Image.Image:
+        """Background with the name composited, scaled to width. Read-only."""
+        base = self.__base_images.get(width)
+        if base is not None:
+            return base
+
+        assert self.__background_image is not None
+        full = self.__base_images.get(self.__background_image.width)
+        if full is None:
+            full = self.__background_image.copy()
+            if self.__name_image is not None and self.__name_image_bbox is not None:
+                full.alpha_composite(
+                    self.__name_image,
+                    (self.__name_image_bbox[0], self.__name_image_bbox[1]),
+                )
+            self.__base_images[full.width] = full
+
+        if width == full.width:
+            return full
+        # Keep only the proxy for the current preview size
+        for other in [w for w in self.__base_images if w != full.width]:
+            del self.__base_images[other]
+            self.__layer_snapshots.pop(other, None)
+        base = scale_to_width(full, width)
+        self.__base_images[width] = base
+        return base
+
+    def create_band_image(
+        self,
+        band: Optional[LeatherBand] = None,
+        max_size: Optional[tuple[int, int]] = None,
+    ) -> Optional[Image.Image]:
+        """Compose the band.
+
+        If band is given, its badges and margin are used instead of those of
+        the engine's band, e.g. to render a copy taken on another thread. The
+        background and name always come from the engine.
+
+        If max_size is given, a proxy of the band that fits into max_size is
+        composed from downscaled copies of the background and badges, which is
+        much cheaper for large assets. Without it, the band is rendered at
+        full resolution.
+
+        If the engine has a snapshot budget, snapshots of the composite are
+        kept after every badge layer, or after every k-th layer if all of
+        them do not fit. Only the layers from the last snapshot below the
+        first changed layer are composed again.
+        """
+        image = self.__create_band_image(band, max_size)
+        if self.metrics is not None:
+            self.metrics.end_render(
+                name=self.__name, size=None if image is None else image.size
             )
+        return image
+
+    def __create_band_image(
+        self, band: Optional[LeatherBand], max_size: Optional[tuple[int, int]]
+    ) -> Optional[Image.Image]:
+        if band is None:
+            band = self.__band
+        if band is None or self.__background_image is None:
+            return None
 
-        bg_width, bg_height = background.size
-
-        current_y = bg_height
-
-        for badge in self.__band.badges:
-            image = None
-            if isinstance(badge, Badge):
-                image = badge.get_image()
-            elif isinstance(badge, BadgeRow):
-                image = self.__create_badge_row_image(badge)
-
-            if image is None:
-                continue
-
-            b_width, b_height = image.size
-
+        if self.__snapshots_base_version != self.__base_version:
+            self.__layer_snapshots = {}
+            self.__base_images = {}
+            self.__snapshots_base_version = self.__base_version
+
+        bg_width = self.__get_render_width(max_size)
+        base = self.__get_base_image(bg_width)
+        snapshots = self.__layer_snapshots.setdefault(bg_width, [])
+        margin = band.margin
+        if bg_width != self.__background_image.width:
+            margin = round(margin * bg_width / self.__background_image.width)
+
+        badges = band.badges
+        sources = [self.__layer_source_key(badge) for badge in badges]
+        if self.compositor == COMPOSITOR_NUMPY:
+            return self.__compose_numpy(base, badges, sources, margin)
+
+        # The position of every layer but the first depends on the margin
+        keys = [
+            (source, margin if index > 0 else None)
+            for index, source in enumerate(sources)
+        ]
+
+        # Find the first layer that differs from the cached snapshots
+        start = 0
+        for snapshot, key in zip(snapshots, keys):
+            if snapshot.key != key:
+                break
+            start += 1
+        # Resume from the closest stored image below the change
+        while start > 0 and snapshots[start - 1].image is None:
+            start -= 1
+        del snapshots[start:]
+        if self.metrics is not None:
+            self.metrics.count("layers_reused", start)
+            self.metrics.count("layers_composited", len(badges) - start)
+
+        if start > 0:
+            previous = snapshots[start - 1]
+            assert previous.image is not None
+            with self.__stage("composite"):
+                background = previous.image.copy()
+            if start == len(badges):
+                return background
+            current_y = previous.top_y - margin
+        else:
+            with self.__stage("composite"):
+                background = base.copy()
+            current_y = background.height
+
+        stride = self.__snapshot_stride(len(badges), base)
+        for index in range(start, len(badges)):
             # scale the image to fit the background width
-            scale = bg_width / b_width
-            image = image.resize(
-                (int(b_width * scale), int(b_height * scale)),
-                resample=Image.Resampling.LANCZOS,
-            )
+            image = self.__get_layer_image(badges[index], sources[index], bg_width)
 
             b_width, b_height = image.size
 
@@ -238,9 +460,114 @@ class Engine:
 
             # Composite the badge
             # We use the badge itself as the mask for transparency
-            background.alpha_composite(image, (x_pos, top_y))
+            with self.__stage("composite"):
+                background.alpha_composite(image, (x_pos, top_y))
+                if stride:
+                    snapshot = None
+                    if (index + 1) % stride == 0 or index == len(badges) - 1:
+                        snapshot = background.copy()
+                    snapshots.append(LayerSnapshot(keys[index], snapshot, top_y))
 
             # Update current_y for the next badge, applying margin
-            current_y = top_y - self.__band.margin
+            current_y = top_y - margin
 
         return background
+
+    def __snapshot_stride(self, layers: int, base: Image.Image) -> int:
+        """Layers per stored snapshot, 0 to keep none."""
+        frames = self.snapshot_bytes // image_size_in_bytes(base)
+        if layers == 0 or frames == 0:
+            return 0
+        # ceil(layers / stride) snapshots are stored
+        return -(-layers // frames)
+
+    def __compose_numpy(
+        self,
+        base: Image.Image,
+        badges: list[Badge | BadgeRow],
+        sources: list[tuple],
+        margin: int,
+    ) -> Image.Image:
+        # Imported lazily to keep NumPy out of the default startup path
+        from .compositor import composite_layers
+
+        # Lay out all badges first, then blend them in a single pass
+        layers: list["Layer"] = []
+        current_y = base.height
+        for badge, source in zip(badges, sources):
+            image = self.__get_layer_image(badge, source, base.width)
+            top_y = current_y - image.height
+            layers.append((image, (base.width - image.width) // 2, top_y))
+            current_y = top_y - margin
+        with self.__stage("composite"):
+            return composite_layers(base, layers)
+
+    def create_name_template(
+        self, band: Optional[LeatherBand] = None
+    ) -> Optional[NameTemplate]:
+        """Compose the band at full resolution without the name.
+
+        Returns None if there is no background or no buttonhole to stamp
+        names into. Stamp names with stamp_name.
+        """
+        if band is None:
+            band = self.__band
+        if self.__background_image is None or self.__name_image_bbox is None:
+            return None
+
+        left, top, right, bottom = self.__name_image_bbox
+        with self.__stage("composite"):
+            image = self.__background_image.copy()
+        overlays = []
+        current_y = image.height
+        for badge in band.badges:
+            layer = self.__get_layer_image(
+                badge, self.__layer_source_key(badge), image.width
+            )
+            x_pos = (image.width - layer.width) // 2
+            top_y = current_y - layer.height
+            with self.__stage("composite"):
+                image.alpha_composite(layer, (x_pos, top_y))
+
+            # Part of the layer covering the buttonhole
+            box = (
+                max(left, x_pos),
+                max(top, top_y),
+                min(right, x_pos + layer.width),
+                min(bottom, top_y + layer.height),
+            )
+            if box[0] < box[2] and box[1] < box[3]:
+                crop = layer.crop(
+                    (box[0] - x_pos, box[1] - top_y, box[2] - x_pos, box[3] - top_y)
+                )
+                overlays.append((crop, (box[0] - left, box[1] - top)))
+            current_y = top_y - band.margin
+        return NameTemplate(
+            image,
+            self.__name_image_bbox,
+            self.__background_image.crop(self.__name_image_bbox),
+            overlays,
+        )
+
+    def stamp_name(self, template: NameTemplate, name: str) -> Image.Image:
+        """Set the name and stamp it into template.image, which is returned."""
+        self.set_name(name)
+        with self.__stage("composite"):
+            return template.stamp(self.__name_image)
+
+    def render_key(self, band: Optional[LeatherBand] = None) -> str:
+        """Key of everything create_band_image(band) depends on.
+
+        See exports.render_key. Raises FileNotFoundError for missing images.
+        """
+        return render_key(
+            band if band is not None else self.__band,
+            self.__name,
+            self.glyph_atlas.font_path,
+            self.font_size,
+        )
+
+    def save_image(self, image: Image.Image, fp, **params):
+        """Encode a rendered band as PNG to a path or file object."""
+        with self.__stage("encode"):
+            image.save(fp, format="PNG", **params)
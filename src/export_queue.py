@@ -0,0 +1,155 @@
+"""Export jobs served by a worker thread.
+
+Exporting renders the band at full resolution, saves the preset, encodes the
+PNG and checks the badge widths. The queue does all of that on its own
+thread with its own Engine, so the UI can move on to the next preset while
+earlier exports are still running. Like PreviewRenderer, the worker never
+touches Tk; the UI collects finished jobs with poll().
+"""
+
+import queue
+import threading
+from typing import NamedTuple, Optional
+
+from .engine import Engine
+from .exports import ExportManifest, png_info
+from .models import Badge, BadgeRow, LeatherBand
+
+
+class ExportJob(NamedTuple):
+    # Copy of the band, it must not be modified after submitting
+    band: LeatherBand
+    # Name stamped into the buttonhole
+    name: str
+    export_path: str
+    # Preset file the band is saved to, None to export without preset
+    preset_path: Optional[str] = None
+
+
+class ExportResult(NamedTuple):
+    job_id: int
+    job: ExportJob
+    # Exported image, or the existing export if it was up to date
+    path: Optional[str]
+    skipped: bool
+    # (index in band.badges, message) for badges that do not fit
+    warnings: list[tuple[int, str]]
+    error: Optional[Exception]
+
+
+class ExportQueue:
+    """Runs export jobs one after another on a worker thread.
+
+    Jobs of presets whose last export in the manifest has the same render
+    key are not rendered again.
+    """
+
+    def __init__(self, manifest: ExportManifest):
+        self.manifest = manifest
+        self.__jobs: queue.Queue[tuple[int, ExportJob]] = queue.Queue()
+        self.__lock = threading.Lock()
+        self.__results: list[ExportResult] = []
+        self.__next_id = 0
+        self.__unfinished = 0
+        self.__engine: Optional[Engine] = None
+        self.__thread = threading.Thread(
+            target=self.__run, name="export-queue", daemon=True
+        )
+        self.__thread.start()
+
+    @property
+    def pending(self) -> int:
+        """Number of jobs that are queued or running."""
+        with self.__lock:
+            return self.__unfinished
+
+    def submit(self, job: ExportJob) -> int:
+        with self.__lock:
+            self.__next_id += 1
+            job_id = self.__next_id
+            self.__unfinished += 1
+        self.__jobs.put((job_id, job))
+        return job_id
+
+    def poll(self) -> tuple[list[ExportResult], int]:
+        """Return the jobs finished since the last call.
+
+        Also returns the number of jobs still pending, read under the same
+        lock, so a job finishing in between cannot be missed.
+        """
+        with self.__lock:
+            results = self.__results
+            self.__results = []
+            return results, self.__unfinished
+
+    def __run(self):
+        while True:
+            job_id, job = self.__jobs.get()
+            try:
+                result = self.__export(job_id, job)
+            except Exception as e:
+                result = ExportResult(job_id, job, None, False, [], e)
+            with self.__lock:
+                self.__results.append(result)
+                self.__unfinished -= 1
+
+    def __export(self, job_id: int, job: ExportJob) -> ExportResult:
+        if self.__engine is None:
+            self.__engine = Engine(job.band)
+        engine = self.__engine
+        engine.set_band(job.band)
+        engine.set_name(job.name)
+
+        try:
+            key = engine.render_key()
+        except (OSError, ValueError):
+            key = None
+
+        path = None
+        if key is not None and job.preset_path is not None:
+            self.manifest.load()
+            path = self.manifest.current_export(job.name, key)
+        skipped = path is not None
+
+        image = None
+        if not skipped:
+            image = engine.create_band_image()
+            if image is None:
+                raise ValueError("No image to export")
+
+        if job.preset_path is not None:
+            try:
+                job.band.save_to_file(job.preset_path)
+            except Exception as e:
+                raise ValueError(f"Failed to save preset: {e}") from e
+
+        if image is not None:
+            path = job.export_path
+            try:
+                if key is None:
+                    engine.save_image(image, path)
+                else:
+                    engine.save_image(image, path, pnginfo=png_info(key))
+            except Exception as e:
+                raise ValueError(f"Failed to export image: {e}") from e
+            if key is not None and job.preset_path is not None:
+                self.manifest.record(job.name, path, key)
+                self.manifest.save()
+
+        return ExportResult(
+            job_id, job, path, skipped, self.__check_scaling(engine, job.band), None
+        )
+
+    def __check_scaling(
+        self, engine: Engine, band: LeatherBand
+    ) -> list[tuple[int, str]]:
+        warnings = []
+        for index, badge in enumerate(band.badges):
+            message = None
+            if isinstance(badge, Badge):
+                message = engine.check_badge_scaling(badge)
+            elif isinstance(badge, BadgeRow):
+                message = engine.check_badge_row_scaling(badge)
+            if message:
+                warnings.append((index, message))
+        return warnings
@@ -0,0 +1,142 @@
+"""Render keys and the export manifest.
+
+The render key of a band is a hash over everything its exported image
+depends on: the preset content, the stamped name, the font and the content
+of every referenced image. It is written into the exported PNG and into a
+manifest in the export folder, so an export whose key did not change can be
+skipped.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import NamedTuple, Optional
+
+from PIL import Image, PngImagePlugin
+
+from .cache import atomic_write, file_digest
+from .codec import encode_band
+from .models import LeatherBand
+
+# Bump when the renderer changes its output for the same inputs
+RENDER_KEY_VERSION = 1
+# tEXt chunk of exported PNGs holding the render key
+RENDER_KEY_CHUNK = "lederband-render-key"
+MANIFEST_FILE_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def _digest(path: str) -> str:
+    if not path:
+        raise FileNotFoundError("Image path is empty")
+    return file_digest(path)
+
+
+def render_key(band: LeatherBand, name: str, font_path: str, font_size: int) -> str:
+    """Hash of all inputs of a render.
+
+    Raises FileNotFoundError if an image of the band does not exist.
+    """
+    preset = encode_band(band)
+    del preset["version"]
+    data = {
+        "version": RENDER_KEY_VERSION,
+        "preset": preset,
+        "name": name,
+        "margin": band.margin,
+        "font": [file_digest(font_path), font_size],
+        "background": _digest(band.image_path),
+        "badges": [_digest(path) for path in band.get_badge_paths()],
+    }
+    encoded = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def png_info(key: str) -> PngImagePlugin.PngInfo:
+    """PNG metadata carrying a render key, pass as pnginfo when saving."""
+    info = PngImagePlugin.PngInfo()
+    info.add_text(RENDER_KEY_CHUNK, key)
+    return info
+
+
+def read_render_key(path: str) -> Optional[str]:
+    """Render key stored in a PNG, without decoding its pixels."""
+    try:
+        with Image.open(path) as image:
+            return image.text.get(RENDER_KEY_CHUNK)  # pyright: ignore[reportAttributeAccessIssue]
+    except (OSError, SyntaxError, AttributeError):
+        return None
+
+
+class ManifestEntry(NamedTuple):
+    # File name within the export folder
+    file: str
+    key: str
+
+
+class ExportManifest:
+    """Render key of the latest export of each preset.
+
+    Stored as manifest.json in the export folder and keyed by preset name,
+    since export file names also contain the date.
+    """
+
+    def __init__(self, export_dir: str):
+        self.export_dir = export_dir
+        self.path = os.path.join(export_dir, MANIFEST_FILE_NAME)
+        self.__entries: dict[str, ManifestEntry] = {}
+        self.__lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        entries = {}
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                entries = {
+                    name: ManifestEntry(entry["file"], entry["key"])
+                    for name, entry in data["exports"].items()
+                }
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            print(f"Warning: Ignoring invalid export manifest {self.path}: {e}")
+        with self.__lock:
+            self.__entries = entries
+
+    def save(self):
+        with self.__lock:
+            data = {
+                "version": MANIFEST_VERSION,
+                "exports": {
+                    name: entry._asdict()
+                    for name, entry in sorted(self.__entries.items())
+                },
+            }
+        os.makedirs(self.export_dir, exist_ok=True)
+        with atomic_write(self.path, "w") as f:
+            json.dump(data, f, indent=2)
+
+    def get(self, preset_name: str) -> Optional[ManifestEntry]:
+        with self.__lock:
+            return self.__entries.get(preset_name)
+
+    def current_export(self, preset_name: str, key: str) -> Optional[str]:
+        """Path of an existing export rendered with key, if there is one.
+
+        The key is also checked in the PNG itself, so replaced or edited
+        exports are not mistaken for current ones.
+        """
+        entry = self.get(preset_name)
+        if entry is None or entry.key != key:
+            return None
+        path = os.path.join(self.export_dir, entry.file)
+        if read_render_key(path) != key:
+            return None
+        return path
+
+    def record(self, preset_name: str, path: str, key: str):
+        with self.__lock:
+            self.__entries[preset_name] = ManifestEntry(os.path.basename(path), key)
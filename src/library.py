@@ -0,0 +1,305 @@
+"""Indexed badge library.
+
+Keeps a SQLite catalog of all badges below the badge folder with their
+size and content hash, so tools can query badges without opening every
+PNG. Scans are incremental: only files whose mtime or size changed are
+read again.
+
+    python -m src.library [--background PATH] [--mismatched] [SEARCH]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+from typing import NamedTuple, Optional
+
+from .cache import file_digest, image_dimensions
+from .config import DEFAULT_BADGE_PATH, DEFAULT_CACHE_PATH
+
+DEFAULT_LIBRARY_PATH = os.path.join(DEFAULT_CACHE_PATH, "library.sqlite3")
+
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS badges (
+    path TEXT PRIMARY KEY,
+    folder TEXT NOT NULL,
+    name TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    matches_background INTEGER
+);
+CREATE INDEX IF NOT EXISTS badges_folder ON badges (folder);
+CREATE INDEX IF NOT EXISTS badges_digest ON badges (digest);
+"""
+
+
+class BadgeEntry(NamedTuple):
+    # Relative to the library root, with "/" as separator
+    path: str
+    folder: str
+    name: str
+    mtime_ns: int
+    size: int
+    width: int
+    height: int
+    digest: str
+    # None if no background width is known
+    matches_background: Optional[bool]
+
+
+class ScanResult(NamedTuple):
+    added: int
+    updated: int
+    removed: int
+    unchanged: int
+
+
+_COLUMNS = ", ".join(BadgeEntry._fields)
+
+
+def _entry(row: tuple) -> BadgeEntry:
+    entry = BadgeEntry(*row)
+    if entry.matches_background is not None:
+        entry = entry._replace(matches_background=bool(entry.matches_background))
+    return entry
+
+
+class BadgeLibrary:
+    """SQLite catalog of the badges below root."""
+
+    def __init__(
+        self, db_path: str = DEFAULT_LIBRARY_PATH, root: str = DEFAULT_BADGE_PATH
+    ):
+        self.db_path = db_path
+        self.root = os.path.abspath(root)
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        # Shared between the UI and worker threads, guarded by the lock
+        self.__connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.__lock = threading.Lock()
+        with self.__lock, self.__connection:
+            self.__connection.executescript(SCHEMA)
+            version = self.__get_meta("schema_version")
+            if version is not None and int(version) != SCHEMA_VERSION:
+                self.__connection.execute("DELETE FROM badges")
+            self.__set_meta("schema_version", str(SCHEMA_VERSION))
+
+    def close(self):
+        with self.__lock:
+            self.__connection.close()
+
+    def __get_meta(self, key: str) -> Optional[str]:
+        row = self.__connection.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def __set_meta(self, key: str, value: Optional[str]):
+        self.__connection.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+        )
+
+    @property
+    def background_width(self) -> Optional[int]:
+        with self.__lock:
+            value = self.__get_meta("background_width")
+        return None if value is None else int(value)
+
+    def abs_path(self, entry: BadgeEntry) -> str:
+        return os.path.join(self.root, *entry.path.split("/"))
+
+    def preset_path(self, entry: BadgeEntry) -> str:
+        """Path of the badge as stored in presets (relative to the cwd)."""
+        return os.path.relpath(self.abs_path(entry))
+
+    def __walk(self) -> dict[str, os.stat_result]:
+        files = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if not filename.lower().endswith(".png"):
+                    continue
+                abs_path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(abs_path)
+                except OSError:
+                    continue
+                rel_path = os.path.relpath(abs_path, self.root)
+                files[rel_path.replace(os.sep, "/")] = st
+        return files
+
+    def scan(self, background_width: Optional[int] = None) -> ScanResult:
+        """Bring the catalog up to date with the badge folder.
+
+        Only new files and files whose mtime or size changed are opened. If
+        background_width is given, it becomes the width the badges are
+        matched against.
+        """
+        files = self.__walk()
+        with self.__lock:
+            known = {
+                path: (mtime_ns, size)
+                for path, mtime_ns, size in self.__connection.execute(
+                    "SELECT path, mtime_ns, size FROM badges"
+                )
+            }
+            if background_width is None:
+                value = self.__get_meta("background_width")
+                background_width = None if value is None else int(value)
+
+        changed = []
+        unchanged = 0
+        for path, st in files.items():
+            if known.get(path) == (st.st_mtime_ns, st.st_size):
+                unchanged += 1
+                continue
+            abs_path = os.path.join(self.root, *path.split("/"))
+            try:
+                width, height = image_dimensions(abs_path)
+                digest = file_digest(abs_path)
+            except (OSError, SyntaxError) as e:
+                print(f"Warning: Could not index badge {abs_path}: {e}")
+                continue
+            folder, _, filename = path.rpartition("/")
+            changed.append(
+                (
+                    path,
+                    folder,
+                    os.path.splitext(filename)[0],
+                    st.st_mtime_ns,
+                    st.st_size,
+                    width,
+                    height,
+                    digest,
+                    None if background_width is None else width == background_width,
+                )
+            )
+        removed = [(path,) for path in known if path not in files]
+
+        with self.__lock, self.__connection:
+            self.__connection.executemany(
+                f"INSERT OR REPLACE INTO badges ({_COLUMNS}) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                changed,
+            )
+            self.__connection.executemany("DELETE FROM badges WHERE path = ?", removed)
+            self.__update_background_width(background_width)
+
+        added = sum(1 for row in changed if row[0] not in known)
+        return ScanResult(added, len(changed) - added, len(removed), unchanged)
+
+    def set_background_width(self, width: Optional[int]):
+        """Match all badges against a new background width."""
+        with self.__lock, self.__connection:
+            self.__update_background_width(width)
+
+    def __update_background_width(self, width: Optional[int]):
+        self.__set_meta("background_width", None if width is None else str(width))
+        self.__connection.execute(
+            "UPDATE badges SET matches_background = "
+            "CASE WHEN ? IS NULL THEN NULL ELSE width = ? END",
+            (width, width),
+        )
+
+    def get(self, path: str) -> Optional[BadgeEntry]:
+        """Entry for a path relative to the root, or for an absolute path."""
+        if os.path.isabs(path):
+            path = os.path.relpath(path, self.root)
+        path = path.replace(os.sep, "/")
+        with self.__lock:
+            row = self.__connection.execute(
+                f"SELECT {_COLUMNS} FROM badges WHERE path = ?", (path,)
+            ).fetchone()
+        return None if row is None else _entry(row)
+
+    def search(
+        self,
+        text: str = "",
+        folder: Optional[str] = None,
+        recursive: bool = True,
+        matches_background: Optional[bool] = None,
+    ) -> list[BadgeEntry]:
+        """Badges whose name contains text, optionally within a folder."""
+        query = f"SELECT {_COLUMNS} FROM badges WHERE name LIKE ? ESCAPE '\\'"
+        escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        params: list = [f"%{escaped}%"]
+        if folder is not None:
+            folder = folder.strip("/")
+            if recursive and folder:
+                # Exact, case-sensitive prefix; LIKE would treat _ as a
+                # wildcard and ignore the case of ASCII letters
+                prefix = folder + "/"
+                query += " AND (folder = ? OR substr(folder, 1, ?) = ?)"
+                params += [folder, len(prefix), prefix]
+            elif not recursive:
+                query += " AND folder = ?"
+                params.append(folder)
+        if matches_background is not None:
+            query += " AND matches_background = ?"
+            params.append(int(matches_background))
+        query += " ORDER BY folder, name"
+        with self.__lock:
+            rows = self.__connection.execute(query, params).fetchall()
+        return [_entry(row) for row in rows]
+
+    def folders(self) -> list[str]:
+        """All folders that contain badges, "" is the root."""
+        with self.__lock:
+            rows = self.__connection.execute(
+                "SELECT DISTINCT folder FROM badges ORDER BY folder"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def __len__(self):
+        with self.__lock:
+            return self.__connection.execute("SELECT COUNT(*) FROM badges").fetchone()[
+                0
+            ]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Update and query the badge index.")
+    parser.add_argument("search", nargs="?", default="", help="part of a badge name")
+    parser.add_argument("--root", default=DEFAULT_BADGE_PATH, help="badge folder")
+    parser.add_argument("--db", default=DEFAULT_LIBRARY_PATH, help="index file")
+    parser.add_argument(
+        "--background", help="background image to match badge widths against"
+    )
+    parser.add_argument(
+        "--mismatched",
+        action="store_true",
+        help="only list badges whose width does not match the background",
+    )
+    args = parser.parse_args(argv)
+
+    background_width = None
+    if args.background is not None:
+        background_width = image_dimensions(args.background)[0]
+
+    library = BadgeLibrary(args.db, args.root)
+    result = library.scan(background_width)
+    print(
+        f"{len(library)} badges indexed "
+        f"({result.added} added, {result.updated} updated, {result.removed} removed)",
+        file=sys.stderr,
+    )
+    entries = library.search(
+        args.search, matches_background=False if args.mismatched else None
+    )
+    for entry in entries:
+        print(f"{entry.width}x{entry.height}\t{library.preset_path(entry)}")
+    library.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""Optional per-stage timing instrumentation for the engine.
+
+An Engine created with a Metrics instance records how long each render
+stage takes and how often each cache hits. Without one, the engine only
+pays for a None check per stage.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+from .buttonhole import buttonhole_cache
+from .cache import image_cache
+from .scaling import scaled_layer_cache
+from .text import name_layer_cache
+
+# Stages recorded by the engine. Stages may nest, e.g. row_assembly
+# includes decoding the badges of the row.
+STAGES = (
+    "decode",
+    "mask_detection",
+    "name_rasterization",
+    "row_assembly",
+    "resize",
+    "composite",
+    "encode",
+)
+
+
+def cache_stats() -> dict[str, dict[str, int]]:
+    """Hit and miss counters of all process-wide caches.
+
+    The raw store counts zero while it is disabled.
+    """
+    raw_store = image_cache.raw_store
+    return {
+        "image": {"hits": image_cache.hits, "misses": image_cache.misses},
+        "scaled_layer": {
+            "hits": scaled_layer_cache.hits,
+            "misses": scaled_layer_cache.misses,
+        },
+        "name_layer": {
+            "hits": name_layer_cache.hits,
+            "misses": name_layer_cache.misses,
+        },
+        "buttonhole": {
+            "hits": buttonhole_cache.hits,
+            "misses": buttonhole_cache.misses,
+        },
+        "raw_store": {
+            "hits": raw_store.hits if raw_store is not None else 0,
+            "misses": raw_store.misses if raw_store is not None else 0,
+        },
+    }
+
+
+def _cache_deltas(
+    current: dict[str, dict[str, int]], previous: dict[str, dict[str, int]]
+) -> dict[str, dict[str, int]]:
+    return {
+        name: {key: value - previous[name][key] for key, value in stats.items()}
+        for name, stats in current.items()
+    }
+
+
+def _hit_rate(hits: int, misses: int) -> Optional[float]:
+    total = hits + misses
+    return hits / total if total else None
+
+
+class StageTimer:
+    def __init__(self, metrics: "Metrics", stage: str):
+        self.__metrics = metrics
+        self.__stage = stage
+        self.__start = 0
+
+    def __enter__(self):
+        self.__start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.__metrics.add_time(self.__stage, time.perf_counter_ns() - self.__start)
+        return False
+
+
+class Metrics:
+    """Collects stage timings and counters.
+
+    Totals are kept since the instance was created or reset and returned by
+    snapshot(); cache counters are process-wide, so they also include cache
+    accesses of other engines. If log_path is set, end_render() appends one
+    JSON line with everything recorded since the previous render to it.
+    """
+
+    def __init__(self, log_path: Optional[str] = None):
+        self.log_path = log_path
+        self.renders = 0
+        self.__lock = threading.Lock()
+        # stage -> [count, total ns, max ns]
+        self.__stages: dict[str, list[int]] = {}
+        self.__counters: dict[str, int] = {}
+        # Recorded since the last end_render()
+        self.__pending_stages: dict[str, int] = {}
+        self.__pending_counters: dict[str, int] = {}
+        self.__initial_cache_stats = self.__last_cache_stats = cache_stats()
+
+    def stage(self, stage: str) -> StageTimer:
+        return StageTimer(self, stage)
+
+    def add_time(self, stage: str, duration_ns: int):
+        with self.__lock:
+            stats = self.__stages.setdefault(stage, [0, 0, 0])
+            stats[0] += 1
+            stats[1] += duration_ns
+            stats[2] = max(stats[2], duration_ns)
+            self.__pending_stages[stage] = (
+                self.__pending_stages.get(stage, 0) + duration_ns
+            )
+
+    def count(self, counter: str, amount: int = 1):
+        with self.__lock:
+            self.__counters[counter] = self.__counters.get(counter, 0) + amount
+            self.__pending_counters[counter] = (
+                self.__pending_counters.get(counter, 0) + amount
+            )
+
+    def end_render(self, **info):
+        """Mark the end of a render and log it if a log path is set."""
+        caches = cache_stats()
+        with self.__lock:
+            self.renders += 1
+            record = {
+                "render": self.renders,
+                "pid": os.getpid(),
+                **info,
+                "stages_ms": {
+                    stage: ns / 1e6 for stage, ns in self.__pending_stages.items()
+                },
+                "counters": dict(self.__pending_counters),
+                "caches": _cache_deltas(caches, self.__last_cache_stats),
+            }
+            self.__pending_stages.clear()
+            self.__pending_counters.clear()
+            self.__last_cache_stats = caches
+
+        if self.log_path is not None:
+            # A single append per line, so several processes can share a file
+            with open(self.log_path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+
+    def snapshot(self) -> dict:
+        """Totals of all stages, counters and cache hit rates."""
+        caches = _cache_deltas(cache_stats(), self.__initial_cache_stats)
+        with self.__lock:
+            return {
+                "renders": self.renders,
+                "stages": {
+                    stage: {
+                        "count": count,
+                        "total_ms": total / 1e6,
+                        "mean_ms": total / count / 1e6,
+                        "max_ms": longest / 1e6,
+                    }
+                    for stage, (count, total, longest) in self.__stages.items()
+                },
+                "counters": dict(self.__counters),
+                "caches": {
+                    name: {
+                        **stats,
+                        "hit_rate": _hit_rate(stats["hits"], stats["misses"]),
+                    }
+                    for name, stats in caches.items()
+                },
+            }
+
+    def reset(self):
+        with self.__lock:
+            self.renders = 0
+            self.__stages.clear()
+            self.__counters.clear()
+            self.__pending_stages.clear()
+            self.__pending_counters.clear()
+            self.__initial_cache_stats = self.__last_cache_stats = cache_stats()
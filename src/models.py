@@ -5,7 +5,8 @@ from dataclasses import dataclass, field
 from typing import List
 
 from dataclasses_json import config, dataclass_json
-from PIL import Image
+
+from .cache import StatKey, image_cache, image_dimensions, stat_key
 
 
 @dataclass_json
@@ -26,7 +27,19 @@ class Badge:
     def get_image(self):
         if not self.image_path or not os.path.exists(os.path.abspath(self.image_path)):
             raise FileNotFoundError(f"Badge image not found: {self.image_path}")
-        return Image.open(os.path.abspath(self.image_path)).convert("RGBA")
+        return image_cache.get(self.image_path)
+
+    def get_image_key(self) -> StatKey:
+        """Key identifying the current version of the badge image file."""
+        if not self.image_path or not os.path.exists(os.path.abspath(self.image_path)):
+            raise FileNotFoundError(f"Badge image not found: {self.image_path}")
+        return stat_key(self.image_path)
+
+    def get_image_size(self) -> tuple[int, int]:
+        """(width, height) of the badge image, read from the file header."""
+        if not self.image_path or not os.path.exists(os.path.abspath(self.image_path)):
+            raise FileNotFoundError(f"Badge image not found: {self.image_path}")
+        return image_dimensions(self.image_path)
 
 
 @dataclass_json
@@ -70,13 +83,32 @@ class LeatherBand:
     def get_image(self):
         if not self.image_path or not os.path.exists(os.path.abspath(self.image_path)):
             raise FileNotFoundError(f"Background image not found: {self.image_path}")
-        return Image.open(os.path.abspath(self.image_path)).convert("RGBA")
+        return image_cache.get(self.image_path)
+
+    def get_badge_paths(self) -> list[str]:
+        """Image paths of all badges, including those in rows."""
+        paths = []
+        for item in self.badges:
+            if isinstance(item, BadgeRow):
+                paths.extend(badge.image_path for badge in item.badges)
+            else:
+                paths.append(item.image_path)
+        return paths
+
+    def prefetch_images(self):
+        """Start decoding the background and all badges in the background."""
+        paths = [self.image_path, *self.get_badge_paths()]
+        image_cache.prefetch(path for path in paths if path)
 
     def save_to_file(self, filepath: str):
+        from .codec import dumps
+
         with open(filepath, "w") as f:
-            f.write(self.to_json())  # pyright: ignore[reportAttributeAccessIssue]
+            f.write(dumps(self))
 
     @classmethod
     def load_from_file(cls, filepath: str) -> "LeatherBand":
-        with open(filepath, "r") as f:
-            return cls.from_json(f.read())  # pyright: ignore[reportAttributeAccessIssue]
+        from .codec import loads
+
+        with open(filepath, "rb") as f:
+            return loads(f.read())
@@ -0,0 +1,42 @@
+"""Collects results of worker threads from the Tk main loop.
+
+Workers never touch Tk. The UI polls them with widget.after() while they
+have work left and stops once they are idle. Deciding to stop must use the
+same locked call that hands out the results: checking for results first
+and for pending work afterwards loses work that finishes in between.
+"""
+
+import tkinter
+from typing import Callable
+
+
+class Poller:
+    """Calls poll every interval milliseconds while it returns True.
+
+    poll collects the finished work and returns whether more is pending,
+    e.g. from a worker method that returns both under one lock. start() is
+    a no-op while polling is already scheduled.
+    """
+
+    def __init__(self, widget: tkinter.Misc, interval: int, poll: Callable[[], bool]):
+        self.__widget = widget
+        self.__interval = interval
+        self.__poll = poll
+        self.__running = False
+
+    def start(self):
+        if not self.__running:
+            self.__running = True
+            self.__widget.after(self.__interval, self.__tick)
+
+    def __tick(self):
+        try:
+            again = self.__poll()
+        except BaseException:
+            # Callback errors go to Tk's handler; a later start() resumes
+            self.__running = False
+            raise
+        if again:
+            self.__widget.after(self.__interval, self.__tick)
+        else:
+            self.__running = False
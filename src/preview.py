@@ -0,0 +1,107 @@
+import threading
+from typing import Callable, NamedTuple, Optional
+
+from PIL import Image
+
+from .models import LeatherBand
+
+
+class RenderResult(NamedTuple):
+    generation: int
+    image: Optional[Image.Image]
+    error: Optional[Exception]
+
+
+class PreviewRenderer:
+    """Runs preview renders on a worker thread.
+
+    Every request gets a new generation number. The worker always renders
+    the most recent request only; results of requests that were superseded
+    while rendering are dropped. The worker never touches Tk, the UI fetches
+    finished results with poll() from the main loop.
+    """
+
+    def __init__(
+        self,
+        render: Callable[
+            [LeatherBand, Optional[tuple[int, int]]], Optional[Image.Image]
+        ],
+    ):
+        self.__render = render
+        self.__condition = threading.Condition()
+        self.__generation = 0
+        self.__band: Optional[LeatherBand] = None
+        self.__max_size: Optional[tuple[int, int]] = None
+        self.__rendered_generation = 0
+        self.__result: Optional[RenderResult] = None
+        self.__thread = threading.Thread(
+            target=self.__run, name="preview-renderer", daemon=True
+        )
+        self.__thread.start()
+
+    @property
+    def generation(self) -> int:
+        return self.__generation
+
+    @property
+    def busy(self) -> bool:
+        with self.__condition:
+            return self.__rendered_generation != self.__generation
+
+    def request(
+        self, band: LeatherBand, max_size: Optional[tuple[int, int]] = None
+    ) -> int:
+        """Request a render of band, superseding any earlier request.
+
+        The band must not be modified afterwards, pass a copy. max_size is
+        handed to the render function to select a proxy render.
+        """
+        with self.__condition:
+            self.__generation += 1
+            self.__band = band
+            self.__max_size = max_size
+            self.__condition.notify()
+            return self.__generation
+
+    def cancel(self):
+        """Drop the pending request, if any."""
+        with self.__condition:
+            self.__generation += 1
+            self.__band = None
+            self.__condition.notify()
+
+    def poll(self) -> tuple[Optional[RenderResult], bool]:
+        """Return the result of the latest request once, if it is finished.
+
+        Also returns whether a render is still running, read under the same
+        lock, so a result finishing in between cannot be missed.
+        """
+        with self.__condition:
+            result = self.__result
+            self.__result = None
+            busy = self.__rendered_generation != self.__generation
+            if result is not None and result.generation != self.__generation:
+                result = None
+        return result, busy
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                while self.__rendered_generation == self.__generation:
+                    self.__condition.wait()
+                generation = self.__generation
+                band = self.__band
+                max_size = self.__max_size
+
+            image = None
+            error = None
+            if band is not None:
+                try:
+                    image = self.__render(band, max_size)
+                except Exception as e:
+                    error = e
+
+            with self.__condition:
+                self.__rendered_generation = generation
+                if band is not None and generation == self.__generation:
+                    self.__result = RenderResult(generation, image, error)
@@ -0,0 +1,183 @@
+"""Zoomable preview canvas.
+
+The surface shows one rendered image at integer zoom levels. Only the part
+of the image under the viewport is upscaled with nearest-neighbour, which
+keeps the pixel art crisp and makes every redraw cost the size of the
+canvas, whatever the zoom. Zooming and panning never need a new render.
+The view is drawn into a single PhotoImage the size of the canvas that is
+updated in place.
+"""
+
+import tkinter as tk
+from typing import Callable, Optional
+
+from PIL import Image, ImageTk
+
+MIN_ZOOM = 1
+MAX_ZOOM = 8
+
+
+class PreviewSurface(tk.Canvas):
+    """Canvas showing an image with zoom and drag to pan.
+
+    Ctrl + mouse wheel zooms around the pointer, the mouse wheel scrolls and
+    dragging with the left button pans.
+    """
+
+    def __init__(self, master, background: str, **kwargs):
+        super().__init__(master, highlightthickness=0, background=background, **kwargs)
+        self.zoom = MIN_ZOOM
+        # Called with the new zoom level
+        self.on_zoom: Optional[Callable[[int], None]] = None
+
+        self.__fill = self.__rgba(background)
+        self.__source: Optional[Image.Image] = None
+        # Top-left corner of the view in zoomed image coordinates
+        self.__offset = (0, 0)
+        self.__drag_start: Optional[tuple[int, int]] = None
+        # Viewport sized buffer and PhotoImage, only replaced on resize
+        self.__frame: Optional[Image.Image] = None
+        self.__photo: Optional[ImageTk.PhotoImage] = None
+
+        self.__image_item = self.create_image(0, 0, anchor="nw", state="hidden")
+        self.__text_item = self.create_text(0, 0, text="Preview", fill="gray60")
+
+        self.bind("<Configure>", lambda _: self.redraw())
+        self.bind("<ButtonPress-1>", self.__on_press)
+        self.bind("<B1-Motion>", self.__on_drag)
+        self.bind("<ButtonRelease-1>", lambda _: self.__on_release())
+        self.bind("<MouseWheel>", self.__on_mouse_wheel)
+        self.bind("<Control-MouseWheel>", self.__on_zoom_wheel)
+        self.bind("<Button-4>", lambda _: self.pan(0, -self.__scroll_step()))
+        self.bind("<Button-5>", lambda _: self.pan(0, self.__scroll_step()))
+        self.bind("<Control-Button-4>", lambda e: self.set_zoom(self.zoom + 1, e))
+        self.bind("<Control-Button-5>", lambda e: self.set_zoom(self.zoom - 1, e))
+
+    def __rgba(self, color: str) -> tuple[int, int, int, int]:
+        r, g, b = self.winfo_rgb(color)
+        return r >> 8, g >> 8, b >> 8, 255
+
+    @property
+    def image(self) -> Optional[Image.Image]:
+        return self.__source
+
+    def set_image(self, image: Optional[Image.Image], message: str = ""):
+        """Show a new image, or message if image is None.
+
+        The zoom level and view position are kept, so consecutive renders
+        of the same band can be compared.
+        """
+        self.__source = image
+        self.itemconfigure(self.__text_item, text=message)
+        self.redraw()
+
+    def set_zoom(self, zoom: int, anchor: Optional[tk.Event] = None):
+        """Change the zoom level, keeping the point under anchor in place."""
+        zoom = max(MIN_ZOOM, min(MAX_ZOOM, zoom))
+        if zoom == self.zoom:
+            return
+        if anchor is not None:
+            ax, ay = anchor.x, anchor.y
+        else:
+            ax, ay = self.winfo_width() // 2, self.winfo_height() // 2
+        # The view may be centered on an image smaller than the canvas
+        view_x, view_y = self.__view_position()
+        x = (self.__offset[0] + ax - view_x) / self.zoom
+        y = (self.__offset[1] + ay - view_y) / self.zoom
+        self.zoom = zoom
+        self.__offset = (round(x * zoom - ax), round(y * zoom - ay))
+        self.redraw()
+        if self.on_zoom is not None:
+            self.on_zoom(zoom)
+
+    def pan(self, dx: int, dy: int):
+        self.__offset = (self.__offset[0] + dx, self.__offset[1] + dy)
+        self.redraw()
+
+    def __zoomed_crop(self, box: tuple[int, int, int, int]) -> Image.Image:
+        """Part of the zoomed image within box, given in zoomed coordinates."""
+        assert self.__source is not None
+        zoom = self.zoom
+        if zoom == 1:
+            return self.__source.crop(box)
+        x0, y0, x1, y1 = box
+        # Source pixels covering the box, partially covered ones included
+        sx0, sy0 = x0 // zoom, y0 // zoom
+        sx1, sy1 = -(-x1 // zoom), -(-y1 // zoom)
+        source = self.__source.crop((sx0, sy0, sx1, sy1))
+        zoomed = source.resize(
+            (source.width * zoom, source.height * zoom), Image.Resampling.NEAREST
+        )
+        left, top = x0 - sx0 * zoom, y0 - sy0 * zoom
+        return zoomed.crop((left, top, left + x1 - x0, top + y1 - y0))
+
+    def __view_position(self) -> tuple[int, int]:
+        """Canvas position of the image, centered if it is smaller."""
+        if self.__source is None:
+            return 0, 0
+        width = self.__source.width * self.zoom
+        height = self.__source.height * self.zoom
+        return (
+            max((self.winfo_width() - width) // 2, 0),
+            max((self.winfo_height() - height) // 2, 0),
+        )
+
+    def redraw(self):
+        view_w, view_h = self.winfo_width(), self.winfo_height()
+        self.coords(self.__text_item, view_w // 2, view_h // 2)
+        if self.__source is None or view_w <= 1 or view_h <= 1:
+            self.itemconfigure(self.__image_item, state="hidden")
+            self.itemconfigure(self.__text_item, state="normal")
+            return
+
+        width = self.__source.width * self.zoom
+        height = self.__source.height * self.zoom
+        # Keep the view inside the image
+        x0 = max(0, min(self.__offset[0], width - view_w))
+        y0 = max(0, min(self.__offset[1], height - view_h))
+        self.__offset = (x0, y0)
+        x1 = min(x0 + view_w, width)
+        y1 = min(y0 + view_h, height)
+
+        if self.__frame is None or self.__frame.size != (view_w, view_h):
+            self.__frame = Image.new("RGBA", (view_w, view_h), self.__fill)
+            self.__photo = None
+        else:
+            self.__frame.paste(self.__fill, (0, 0, view_w, view_h))
+        self.__frame.alpha_composite(
+            self.__zoomed_crop((x0, y0, x1, y1)), self.__view_position()
+        )
+
+        if self.__photo is None:
+            self.__photo = ImageTk.PhotoImage(self.__frame, master=self)
+            self.itemconfigure(self.__image_item, image=self.__photo)
+        else:
+            self.__photo.paste(self.__frame)
+        self.itemconfigure(self.__image_item, state="normal")
+        self.itemconfigure(self.__text_item, state="hidden")
+
+    def __scroll_step(self) -> int:
+        return max(self.winfo_height() // 10, 1)
+
+    def __on_press(self, event):
+        self.__drag_start = (event.x, event.y)
+        self.configure(cursor="fleur")
+
+    def __on_drag(self, event):
+        if self.__drag_start is None:
+            return
+        dx = self.__drag_start[0] - event.x
+        dy = self.__drag_start[1] - event.y
+        self.__drag_start = (event.x, event.y)
+        self.pan(dx, dy)
+
+    def __on_release(self):
+        self.__drag_start = None
+        self.configure(cursor="")
+
+    def __on_mouse_wheel(self, event):
+        step = self.__scroll_step()
+        self.pan(0, -step if event.delta > 0 else step)
+
+    def __on_zoom_wheel(self, event):
+        self.set_zoom(self.zoom + (1 if event.delta > 0 else -1), event)
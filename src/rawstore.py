@@ -0,0 +1,170 @@
+"""Decoded RGBA pixels on disk.
+
+Inflating a PNG and converting it to RGBA is the main cost of loading an
+image, and every render process pays it again. The raw store keeps the
+decoded pixels of each image as <digest>.rgba under the cache folder. A
+file is memory-mapped and wrapped as an image without copying, so batch
+workers share decoded images through the page cache.
+
+The store is opt-in, see ImageCache.raw_store, and limited to max_bytes.
+Loading a file touches it; when the limit is exceeded, the files used
+least recently are removed, which also drops the pixels of edited images.
+
+A file starts with a header of HEADER_SIZE bytes: the magic, width and
+height, and the SHA-256 digest of the source file. The pixels follow.
+"""
+
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Optional
+
+from PIL import Image
+
+from .cache import atomic_write
+from .config import DEFAULT_CACHE_PATH
+
+DEFAULT_RAW_STORE_PATH = os.path.join(DEFAULT_CACHE_PATH, "raw")
+DEFAULT_RAW_STORE_BYTES = 1024 * 1024 * 1024
+# Fraction of max_bytes kept when the store is pruned, so the next writes
+# do not prune again right away
+PRUNE_TARGET = 0.8
+# Temporary files older than this are left over from crashed writers
+STALE_TMP_SECONDS = 3600
+MAGIC = b"LBRGBA01"
+# magic, width, height, source digest; padded to 64 bytes
+HEADER = struct.Struct(">8sII32s")
+HEADER_SIZE = 64
+
+
+class RawImageStore:
+    """Decoded RGBA images keyed by the content hash of their source file.
+
+    Images returned by load are backed by a read-only mapping of the file.
+    Pillow copies them before any in-place change.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_RAW_STORE_PATH,
+        max_bytes: int = DEFAULT_RAW_STORE_BYTES,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.__lock = threading.Lock()
+        # Size of the store, None until it was scanned by this process
+        self.__bytes: Optional[int] = None
+
+    def __count(self, hit: bool):
+        with self.__lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def __file(self, digest: str) -> str:
+        return os.path.join(self.path, digest + ".rgba")
+
+    def load(self, digest: str) -> Optional[Image.Image]:
+        """Mapped image for digest, or None if it is not stored or invalid."""
+        path = self.__file(digest)
+        try:
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # ValueError for empty files, which cannot be mapped
+            self.__count(hit=False)
+            return None
+
+        valid = len(mapped) >= HEADER_SIZE
+        if valid:
+            magic, width, height, source = HEADER.unpack_from(mapped)
+            valid = (
+                magic == MAGIC
+                and source.hex() == digest
+                and len(mapped) == HEADER_SIZE + width * height * 4
+            )
+        self.__count(hit=valid)
+        if not valid:
+            mapped.close()
+            return None
+        try:
+            # Recently used files are kept when pruning
+            os.utime(path)
+        except OSError:
+            pass
+
+        # The image keeps the mapping alive until it is garbage collected
+        pixels = memoryview(mapped)[HEADER_SIZE:]
+        return Image.frombuffer("RGBA", (width, height), pixels, "raw", "RGBA", 0, 1)
+
+    def store(self, digest: str, image: Image.Image):
+        """Write the pixels of an RGBA image decoded from a file with digest."""
+        size = HEADER_SIZE + image.width * image.height * 4
+        if size > self.max_bytes:
+            return
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            # Batch workers may store the same image at the same time
+            with atomic_write(self.__file(digest)) as f:
+                header = HEADER.pack(
+                    MAGIC, image.width, image.height, bytes.fromhex(digest)
+                )
+                f.write(header.ljust(HEADER_SIZE, b"\0"))
+                f.write(image.tobytes())
+        except OSError as e:
+            print(f"Warning: Could not write raw image store: {e}")
+            return
+
+        with self.__lock:
+            if self.__bytes is not None:
+                self.__bytes += size
+            over = self.__bytes is None or self.__bytes > self.max_bytes
+        if over:
+            self.prune()
+
+    def prune(self):
+        """Remove the least recently used files until the store fits.
+
+        Also removes temporary files left behind by crashed writers.
+        """
+        files = []
+        now = time.time()
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            names = []
+        for name in names:
+            path = os.path.join(self.path, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if name.endswith(".tmp"):
+                if now - st.st_mtime > STALE_TMP_SECONDS:
+                    self.__remove(path)
+            elif name.endswith(".rgba"):
+                files.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        if total > self.max_bytes:
+            target = self.max_bytes * PRUNE_TARGET
+            for _, size, path in sorted(files):
+                if total <= target:
+                    break
+                if self.__remove(path):
+                    total -= size
+        with self.__lock:
+            self.__bytes = total
+
+    def __remove(self, path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            # E.g. still mapped by another process on Windows
+            return False
@@ -0,0 +1,160 @@
+"""Render one preset for many names.
+
+The band of the preset is composed once without a name; for every name of
+the roster only the buttonhole region is composed again. The roster is a
+text file with one name per line or a CSV file:
+
+    python -m src.roster PRESET.json ROSTER [-o output/PRESET/] [--column NAME]
+        [--force]
+
+Images are written as <name>.png, with a numbered suffix for names that
+would share a file. Images whose render key matches the one stored in the
+existing file are skipped.
+"""
+
+import argparse
+import csv
+import os
+import pathlib
+import re
+import sys
+from typing import Optional
+
+from .config import DEFAULT_EXPORT_PATH
+from .engine import Engine
+from .exports import png_info, read_render_key
+from .models import LeatherBand
+
+# Characters not allowed in file names on Windows
+UNSAFE_FILE_NAME_CHARS = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+
+
+def read_roster(path: str, column: Optional[str] = None) -> list[str]:
+    """Names of a roster file, in order and without duplicates.
+
+    CSV files (.csv) use the given column of their header row, or the first
+    column of every row without header. Other files have one name per line.
+    """
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if path.lower().endswith(".csv"):
+            if column is not None:
+                reader = csv.DictReader(f)
+                if reader.fieldnames is None or column not in reader.fieldnames:
+                    raise ValueError(f"Roster has no column {column!r}: {path}")
+                names = [row[column] or "" for row in reader]
+            else:
+                names = [row[0] if row else "" for row in csv.reader(f)]
+        else:
+            names = f.read().splitlines()
+    return list(dict.fromkeys(name.strip() for name in names if name.strip()))
+
+
+def file_names(names: list[str]) -> list[str]:
+    """Distinct image file names for names, in the same order.
+
+    Names that map to the same file, e.g. "A/B" and "A_B", or that only
+    differ in case, which case-insensitive file systems do not tell apart,
+    get a numbered suffix.
+    """
+    used = set()
+    result = []
+    for name in names:
+        stem = UNSAFE_FILE_NAME_CHARS.sub("_", name).strip(". ") or "_"
+        candidate = stem
+        number = 2
+        while candidate.casefold() in used:
+            candidate = f"{stem} ({number})"
+            number += 1
+        if candidate != stem:
+            print(f'Warning: "{name}" is written as "{candidate}.png"')
+        used.add(candidate.casefold())
+        result.append(candidate + ".png")
+    return result
+
+
+def render_roster(
+    preset_path: str,
+    names: list[str],
+    output_dir: str,
+    force: bool = False,
+) -> tuple[list[str], list[str], list[tuple[str, str]]]:
+    """Render the preset once per name into output_dir.
+
+    Returns the written image paths, the names skipped because their image
+    is up to date and a list of (name, error) pairs. With force, every
+    name is rendered.
+    """
+    band = LeatherBand.load_from_file(preset_path)
+    engine = Engine(band)
+    engine.set_band(band)
+    template = engine.create_name_template()
+    if template is None:
+        raise ValueError(f"Background has no buttonhole for names: {band.image_path}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    written = []
+    skipped = []
+    failed = []
+    for name, image_file in zip(names, file_names(names)):
+        path = os.path.join(output_dir, image_file)
+        try:
+            engine.set_name(name)
+            key = engine.render_key()
+            if not force and read_render_key(path) == key:
+                skipped.append(name)
+                continue
+            image = engine.stamp_name(template, name)
+            engine.save_image(image, path, pnginfo=png_info(key))
+        except Exception as e:
+            failed.append((name, str(e)))
+            continue
+        written.append(path)
+    return written, skipped, failed
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Render a preset once for every name of a roster."
+    )
+    parser.add_argument("preset", help="preset JSON file used as template")
+    parser.add_argument("roster", help="text file with one name per line, or CSV")
+    parser.add_argument(
+        "-o",
+        "--output",
+        default=None,
+        help="output directory (default: <export folder>/<preset name>)",
+    )
+    parser.add_argument(
+        "--column", default=None, help="CSV column holding the names"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="render all names, even if their image is up to date",
+    )
+    args = parser.parse_args(argv)
+
+    output = args.output
+    if output is None:
+        output = os.path.join(DEFAULT_EXPORT_PATH, pathlib.Path(args.preset).stem)
+
+    try:
+        names = read_roster(args.roster, args.column)
+        written, skipped, failed = render_roster(
+            args.preset, names, output, args.force
+        )
+    except (OSError, ValueError) as e:
+        print(f"Failed to render roster: {e}", file=sys.stderr)
+        return 1
+
+    for name, error in failed:
+        print(f"Failed to render {name}: {error}", file=sys.stderr)
+    print(
+        f"Rendered {len(written)} of {len(names)} names to {output}"
+        f" ({len(skipped)} up to date)"
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
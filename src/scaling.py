@@ -0,0 +1,54 @@
+from typing import Optional
+
+from PIL import Image
+
+from .cache import ImageLRU
+
+# Default memory budget for scaled badge layers
+DEFAULT_SCALED_CACHE_BYTES = 128 * 1024 * 1024
+
+
+def scaled_size(size: tuple[int, int], width: int) -> tuple[int, int]:
+    """Size of an image scaled to the given width, keeping the aspect ratio."""
+    scale = width / size[0]
+    return max(1, int(size[0] * scale)), max(1, int(size[1] * scale))
+
+
+def resample_filter(source_width: int, width: int) -> Optional[Image.Resampling]:
+    """Pick the resampling filter for scaling source_width to width.
+
+    Returns None if no scaling is needed. Badges are pixel art, so exact
+    integer upscales use nearest neighbour to keep the pixels crisp; every
+    other factor, including integer downscales that would drop pixels,
+    falls back to LANCZOS.
+    """
+    if source_width == width:
+        return None
+    if width % source_width == 0:
+        return Image.Resampling.NEAREST
+    return Image.Resampling.LANCZOS
+
+
+def scale_to_width(image: Image.Image, width: int) -> Image.Image:
+    """Scale an image to the given width.
+
+    If the image already has the requested width it is returned unchanged.
+    """
+    resample = resample_filter(image.width, width)
+    if resample is None:
+        return image
+    return image.resize(scaled_size(image.size, width), resample=resample)
+
+
+class ScaledLayerCache(ImageLRU):
+    """LRU cache of badge layers scaled to a target width.
+
+    Entries are keyed by (source key, width). The source key has to change
+    whenever the source image does, e.g. the stat keys of its files.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_SCALED_CACHE_BYTES):
+        super().__init__(max_bytes)
+
+
+scaled_layer_cache = ScaledLayerCache()
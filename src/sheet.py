@@ -0,0 +1,346 @@
+"""Contact sheets for printing.
+
+Lays out the bands of many presets in a grid and writes the sheet as PNG
+one grid row at a time, so the whole sheet is never held in memory. Bands
+are rendered across a process pool and placed as they finish; only the
+rows that are still waiting for bands are buffered:
+
+    python -m src.sheet [presets/] [-o SHEET.png] [-c COLUMNS] [--gutter PX]
+        [--dpi DPI] [-j WORKERS] [--transparent] [--raw-store]
+"""
+
+import argparse
+import math
+import os
+import struct
+import sys
+import zlib
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from datetime import datetime
+from typing import BinaryIO, NamedTuple, Optional
+
+from PIL import Image
+
+from .batch import find_presets, init_worker, render_band
+from .cache import atomic_write, image_dimensions
+from .config import DEFAULT_EXPORT_PATH, DEFAULT_PRESET_PATH, EXPORT_DATE_FORMAT
+from .models import LeatherBand
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Compressed bytes collected before an IDAT chunk is written
+IDAT_SIZE = 256 * 1024
+# Filter type byte in front of every row
+FILTER_NONE = b"\x00"
+INCH_IN_METERS = 0.0254
+
+DEFAULT_COLUMNS = 10
+DEFAULT_GUTTER = 20
+DEFAULT_DPI = 300
+WHITE = (255, 255, 255, 255)
+TRANSPARENT = (0, 0, 0, 0)
+
+
+class PngStreamWriter:
+    """Writes an RGBA PNG from horizontal strips of known total size.
+
+    Only the current strip and the compressor state are kept in memory.
+    Rows are stored unfiltered, which keeps encoding cheap and compresses
+    the flat areas of band images well.
+    """
+
+    def __init__(
+        self,
+        fp: BinaryIO,
+        width: int,
+        height: int,
+        dpi: Optional[float] = None,
+        compress_level: int = 6,
+    ):
+        if width <= 0 or height <= 0:
+            raise ValueError(f"Invalid PNG size: {width}x{height}")
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self.__fp = fp
+        self.__compressor = zlib.compressobj(compress_level)
+        self.__pending: list[bytes] = []
+        self.__pending_size = 0
+
+        fp.write(PNG_SIGNATURE)
+        # 8 bit RGBA, no interlacing
+        self.__chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+        if dpi is not None:
+            ppm = round(dpi / INCH_IN_METERS)
+            self.__chunk(b"pHYs", struct.pack(">IIB", ppm, ppm, 1))
+
+    def __chunk(self, kind: bytes, data: bytes):
+        self.__fp.write(struct.pack(">I", len(data)))
+        self.__fp.write(kind)
+        self.__fp.write(data)
+        self.__fp.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(kind))))
+
+    def __flush_idat(self):
+        if self.__pending:
+            self.__chunk(b"IDAT", b"".join(self.__pending))
+            self.__pending = []
+            self.__pending_size = 0
+
+    def __compress(self, data: bytes | memoryview):
+        compressed = self.__compressor.compress(data)
+        if compressed:
+            self.__pending.append(compressed)
+            self.__pending_size += len(compressed)
+            if self.__pending_size >= IDAT_SIZE:
+                self.__flush_idat()
+
+    def write_strip(self, strip: Image.Image):
+        """Append the rows of an RGBA image as wide as the PNG."""
+        if strip.mode != "RGBA" or strip.width != self.width:
+            raise ValueError(
+                f"Strip must be RGBA and {self.width} pixels wide, "
+                f"got {strip.mode} {strip.width}x{strip.height}"
+            )
+        if self.rows_written + strip.height > self.height:
+            raise ValueError("Strip exceeds the height of the PNG")
+
+        stride = self.width * 4
+        pixels = memoryview(strip.tobytes())
+        # Rows are fed to the compressor one by one, each after its filter
+        # type byte, without assembling the scanlines in a second buffer
+        for y in range(strip.height):
+            self.__compress(FILTER_NONE)
+            self.__compress(pixels[y * stride : (y + 1) * stride])
+        self.rows_written += strip.height
+
+    def close(self):
+        if self.rows_written != self.height:
+            raise ValueError(
+                f"Only {self.rows_written} of {self.height} rows were written"
+            )
+        remaining = self.__compressor.flush()
+        if remaining:
+            self.__pending.append(remaining)
+        self.__flush_idat()
+        self.__chunk(b"IEND", b"")
+
+
+class SheetLayout(NamedTuple):
+    count: int
+    columns: int
+    rows: int
+    cell_width: int
+    cell_height: int
+    gutter: int
+
+    @property
+    def width(self) -> int:
+        return self.columns * (self.cell_width + self.gutter) + self.gutter
+
+    @property
+    def height(self) -> int:
+        return self.rows * (self.cell_height + self.gutter) + self.gutter
+
+    def cells_in_row(self, row: int) -> int:
+        return min(self.columns, self.count - row * self.columns)
+
+
+def sheet_layout(
+    sizes: list[tuple[int, int]], columns: int, gutter: int
+) -> SheetLayout:
+    """Grid with cells large enough for the largest band."""
+    if not sizes:
+        raise ValueError("No bands to lay out")
+    columns = max(min(columns, len(sizes)), 1)
+    return SheetLayout(
+        count=len(sizes),
+        columns=columns,
+        rows=math.ceil(len(sizes) / columns),
+        cell_width=max(width for width, _ in sizes),
+        cell_height=max(height for _, height in sizes),
+        gutter=gutter,
+    )
+
+
+def band_size(preset_path: str) -> tuple[int, int]:
+    """Size of the rendered band, which is the size of its background."""
+    band = LeatherBand.load_from_file(preset_path)
+    if not band.image_path:
+        raise FileNotFoundError(f"Preset has no background image: {preset_path}")
+    return image_dimensions(band.image_path)
+
+
+def render_sheet(
+    preset_paths: list[str],
+    output_path: str,
+    columns: int = DEFAULT_COLUMNS,
+    gutter: int = DEFAULT_GUTTER,
+    dpi: Optional[float] = DEFAULT_DPI,
+    background: tuple[int, int, int, int] = WHITE,
+    max_workers: Optional[int] = None,
+    raw_store: bool = False,
+) -> tuple[list[str], list[tuple[str, str]]]:
+    """Render presets into a contact sheet at output_path.
+
+    Bands are placed in the order of preset_paths, centered in their cell.
+    Returns the placed presets and a list of (preset, error) pairs for
+    presets that failed; the cells of presets that fail while rendering
+    stay empty. With raw_store, the workers share decoded images through
+    the raw store.
+    """
+    failed: list[tuple[str, str]] = []
+    presets = []
+    sizes = []
+    for path in preset_paths:
+        try:
+            sizes.append(band_size(path))
+            presets.append(path)
+        except (OSError, ValueError, SyntaxError) as e:
+            failed.append((path, str(e)))
+    layout = sheet_layout(sizes, columns, gutter)
+
+    workers = max_workers or os.cpu_count() or 1
+    # Rows whose bands may be rendered ahead of the row being written
+    buffered_rows = max(2, math.ceil(workers / layout.columns) + 1)
+
+    placed = []
+    strips: dict[int, Image.Image] = {}
+    finished_in_row: dict[int, int] = {}
+    strip_height = layout.cell_height + layout.gutter
+
+    def strip(row: int) -> Image.Image:
+        if row not in strips:
+            strips[row] = Image.new("RGBA", (layout.width, strip_height), background)
+        return strips[row]
+
+    def place(index: int, image: Image.Image):
+        row, column = divmod(index, layout.columns)
+        x = layout.gutter + column * (layout.cell_width + layout.gutter)
+        x += (layout.cell_width - image.width) // 2
+        y = (layout.cell_height - image.height) // 2
+        strip(row).alpha_composite(image.convert("RGBA"), (x, y))
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    # Written to a temporary file, so no partial sheet is left behind
+    with (
+        atomic_write(output_path) as f,
+        ProcessPoolExecutor(
+            max_workers=workers, initializer=init_worker, initargs=(raw_store,)
+        ) as pool,
+    ):
+        writer = PngStreamWriter(f, layout.width, layout.height, dpi)
+        if layout.gutter > 0:
+            # Gutter above the first row
+            writer.write_strip(
+                Image.new("RGBA", (layout.width, layout.gutter), background)
+            )
+
+        pending: dict[Future, int] = {}
+        next_index = 0
+        next_row = 0
+        while next_row < layout.rows:
+            limit = min((next_row + buffered_rows) * layout.columns, len(presets))
+            while next_index < limit:
+                pending[pool.submit(render_band, presets[next_index])] = next_index
+                next_index += 1
+
+            if finished_in_row.get(next_row, 0) == layout.cells_in_row(next_row):
+                # Each strip holds a grid row and the gutter below it
+                writer.write_strip(strip(next_row))
+                del strips[next_row]
+                next_row += 1
+                continue
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    place(index, future.result())
+                    placed.append(presets[index])
+                except Exception as e:
+                    failed.append((presets[index], str(e)))
+                row = index // layout.columns
+                finished_in_row[row] = finished_in_row.get(row, 0) + 1
+        writer.close()
+    return placed, failed
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Render all presets in a directory into a contact sheet."
+    )
+    parser.add_argument(
+        "presets",
+        nargs="?",
+        default=DEFAULT_PRESET_PATH,
+        help="directory containing preset JSON files",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default=None,
+        help="sheet file (default: <export folder>/<date> Sheet.png)",
+    )
+    parser.add_argument(
+        "-c", "--columns", type=int, default=DEFAULT_COLUMNS, help="bands per row"
+    )
+    parser.add_argument(
+        "--gutter",
+        type=int,
+        default=DEFAULT_GUTTER,
+        help="space between and around the bands in pixels",
+    )
+    parser.add_argument(
+        "--dpi", type=float, default=DEFAULT_DPI, help="print resolution"
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=None,
+        help="number of worker processes (default: number of CPU cores)",
+    )
+    parser.add_argument(
+        "--transparent",
+        action="store_true",
+        help="transparent instead of white sheet background",
+    )
+    parser.add_argument(
+        "--raw-store",
+        action="store_true",
+        help="keep decoded images under cache/raw for later runs",
+    )
+    args = parser.parse_args(argv)
+
+    preset_paths = find_presets(args.presets)
+    if not preset_paths:
+        print(f"No presets found in {args.presets}", file=sys.stderr)
+        return 1
+
+    output = args.output
+    if output is None:
+        date = datetime.now().strftime(EXPORT_DATE_FORMAT)
+        output = os.path.join(DEFAULT_EXPORT_PATH, f"{date} Sheet.png")
+
+    try:
+        placed, failed = render_sheet(
+            preset_paths,
+            output,
+            args.columns,
+            args.gutter,
+            args.dpi,
+            TRANSPARENT if args.transparent else WHITE,
+            args.workers,
+            args.raw_store,
+        )
+    except (OSError, ValueError) as e:
+        print(f"Failed to render sheet: {e}", file=sys.stderr)
+        return 1
+
+    for preset_path, error in failed:
+        print(f"Failed to render {preset_path}: {error}", file=sys.stderr)
+    print(f"Placed {len(placed)} of {len(preset_paths)} bands on {output}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
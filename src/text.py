@@ -0,0 +1,159 @@
+"""Text rendering for the name stamped into the buttonhole.
+
+Names are assembled from pre-rasterized glyph bitmaps instead of running
+FreeType for every name. Finished name layers are cached as well.
+"""
+
+import threading
+from typing import NamedTuple, Optional
+
+from PIL import Image, ImageDraw, ImageFont
+
+from .cache import ImageLRU
+
+# Default memory budget for finished name layers
+DEFAULT_NAME_LAYER_CACHE_BYTES = 16 * 1024 * 1024
+
+
+class Glyph(NamedTuple):
+    # "L" mask of the glyph's ink, None for glyphs without ink (e.g. space)
+    mask: Optional[Image.Image]
+    # position of the mask relative to the pen position
+    offset: tuple[int, int]
+    advance: float
+
+
+class GlyphAtlas:
+    """Pre-rasterized glyphs of one font at one size.
+
+    Glyphs are rendered without anti-aliasing, like ImageDraw with
+    fontmode "1". Text is only assembled from glyphs if the pen positions
+    match FreeType's, i.e. for integer advances without kerning, which is
+    the case for pixel fonts. Otherwise ImageDraw is used. Widths match
+    ImageDraw.textbbox, which includes the advances of glyphs without ink
+    such as spaces.
+    """
+
+    def __init__(self, font_path: str, size: int):
+        self.font_path = font_path
+        self.size = size
+        self.__font: Optional[ImageFont.FreeTypeFont] = None
+        self.__glyphs: dict[str, Glyph] = {}
+        # Engines on different threads share the atlas, and FreeType fonts
+        # must not be used concurrently. Every font call holds this lock.
+        self.__lock = threading.RLock()
+
+    @property
+    def font(self) -> ImageFont.FreeTypeFont:
+        # Loaded on first use to keep startup fast
+        with self.__lock:
+            if self.__font is None:
+                self.__font = ImageFont.truetype(self.font_path, self.size)
+            return self.__font
+
+    def glyph(self, char: str) -> Glyph:
+        glyph = self.__glyphs.get(char)
+        if glyph is not None:
+            return glyph
+
+        with self.__lock:
+            glyph = self.__glyphs.get(char)
+            if glyph is not None:
+                return glyph
+            x0, y0, x1, y1 = self.font.getbbox(char)
+            mask = None
+            if x1 > x0 and y1 > y0:
+                mask = Image.new("L", (x1 - x0, y1 - y0), 0)
+                draw = ImageDraw.Draw(mask)
+                draw.fontmode = "1"
+                draw.text((-x0, -y0), char, font=self.font, fill=255)
+            glyph = Glyph(mask, (int(x0), int(y0)), self.font.getlength(char))
+            self.__glyphs[char] = glyph
+        return glyph
+
+    def layout(self, text: str) -> Optional[list[tuple[Glyph, int]]]:
+        """Glyphs of text with their pen x positions.
+
+        Returns None if the glyphs cannot reproduce the font's own layout.
+        """
+        pen_x = 0.0
+        positions = []
+        for char in text:
+            glyph = self.glyph(char)
+            if not glyph.advance.is_integer():
+                return None
+            positions.append((glyph, int(pen_x)))
+            pen_x += glyph.advance
+        with self.__lock:
+            length = self.font.getlength(text)
+        if length != pen_x:
+            # Kerning or shaping moved glyphs
+            return None
+        return positions
+
+    def text_width(self, text: str) -> int:
+        """Width of text like ImageDraw.textbbox with fontmode "1".
+
+        The box starts at the pen origin and extends to the end of the last
+        advance, or further where ink reaches beyond them.
+        """
+        positions = self.layout(text)
+        if positions is None:
+            draw = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+            draw.fontmode = "1"
+            with self.__lock:
+                bbox = draw.textbbox((0, 0), text, font=self.font)
+            return int(bbox[2] - bbox[0])
+
+        left = 0
+        right = sum(glyph.advance for glyph, _ in positions)
+        for glyph, x in positions:
+            if glyph.mask is None:
+                continue
+            x0 = x + glyph.offset[0]
+            left = min(left, x0)
+            right = max(right, x0 + glyph.mask.width)
+        return int(right - left)
+
+    def draw_text(
+        self,
+        image: Image.Image,
+        xy: tuple[int, int],
+        text: str,
+        fill: tuple[int, ...],
+    ):
+        """Draw text onto image, like ImageDraw.text with fontmode "1"."""
+        positions = self.layout(text)
+        if positions is None:
+            draw = ImageDraw.Draw(image)
+            draw.fontmode = "1"
+            with self.__lock:
+                draw.text(xy, text, font=self.font, fill=fill)
+            return
+
+        for glyph, x in positions:
+            if glyph.mask is None:
+                continue
+            image.paste(
+                fill,
+                (xy[0] + x + glyph.offset[0], xy[1] + glyph.offset[1]),
+                glyph.mask,
+            )
+
+
+_atlases: dict[tuple[str, int], GlyphAtlas] = {}
+_atlases_lock = threading.Lock()
+
+
+def get_glyph_atlas(font_path: str, size: int) -> GlyphAtlas:
+    """Shared glyph atlas for a font file and size."""
+    with _atlases_lock:
+        atlas = _atlases.get((font_path, size))
+        if atlas is None:
+            atlas = GlyphAtlas(font_path, size)
+            _atlases[(font_path, size)] = atlas
+        return atlas
+
+
+# Finished name layers keyed by font, name, bbox, rotation and background
+name_layer_cache = ImageLRU(DEFAULT_NAME_LAYER_CACHE_BYTES)
@@ -0,0 +1,134 @@
+"""Badge thumbnails for the badge browser.
+
+Thumbnails are generated on a thread pool and stored as PNG files under the
+cache folder, keyed by the content hash of the badge, so each badge is only
+scaled down once. Finished thumbnails are collected with poll() from the Tk
+main loop, the workers never touch Tk.
+"""
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+from PIL import Image
+
+from .cache import ImageLRU, atomic_write
+from .config import DEFAULT_CACHE_PATH
+
+DEFAULT_THUMBNAIL_CACHE_PATH = os.path.join(DEFAULT_CACHE_PATH, "thumbnails")
+THUMBNAIL_SIZE = (96, 48)
+THUMBNAIL_MEMORY_BYTES = 16 * 1024 * 1024
+
+
+def make_thumbnail(path: str, size: tuple[int, int]) -> Image.Image:
+    """Scale an image down to fit size, keeping its aspect ratio."""
+    with Image.open(path) as image:
+        image = image.convert("RGBA")
+    # Badges are pixel art, integer steps stay crisp
+    factor = max(image.width / size[0], image.height / size[1], 1)
+    width = max(int(image.width / factor), 1)
+    height = max(int(image.height / factor), 1)
+    if (width, height) == image.size:
+        return image
+    resample = Image.Resampling.NEAREST if factor.is_integer() else Image.Resampling.BOX
+    return image.resize((width, height), resample)
+
+
+class ThumbnailCache:
+    """Thumbnails keyed by badge content hash, in memory and on disk."""
+
+    def __init__(
+        self,
+        path: str = DEFAULT_THUMBNAIL_CACHE_PATH,
+        size: tuple[int, int] = THUMBNAIL_SIZE,
+        max_workers: int = 4,
+    ):
+        self.path = path
+        self.size = size
+        self.__memory = ImageLRU(THUMBNAIL_MEMORY_BYTES)
+        self.__pool: Optional[ThreadPoolExecutor] = None
+        self.__max_workers = max_workers
+        self.__lock = threading.Lock()
+        # digest -> pending future
+        self.__in_flight: dict[str, Future] = {}
+        self.__finished: list[tuple[str, Image.Image]] = []
+
+    def lookup(self, digest: str) -> Optional[Image.Image]:
+        """Thumbnail if it is already in memory."""
+        return self.__memory.lookup(digest)
+
+    def request(self, digest: str, source_path: str):
+        """Load or generate a thumbnail in the background.
+
+        Requests for a thumbnail that is already pending are ignored.
+        """
+        with self.__lock:
+            if digest in self.__in_flight or digest in self.__memory:
+                return
+            if self.__pool is None:
+                self.__pool = ThreadPoolExecutor(
+                    self.__max_workers, thread_name_prefix="thumbnails"
+                )
+            self.__in_flight[digest] = self.__pool.submit(
+                self.__load, digest, source_path
+            )
+
+    def cancel_pending(self):
+        """Drop requests that have not started yet, e.g. after scrolling."""
+        with self.__lock:
+            for digest, future in list(self.__in_flight.items()):
+                if future.cancel():
+                    del self.__in_flight[digest]
+
+    def poll(self) -> tuple[list[tuple[str, Image.Image]], bool]:
+        """Return the thumbnails finished since the last call.
+
+        Also returns whether thumbnails are still pending, read under the
+        same lock, so a thumbnail finishing in between cannot be missed.
+        """
+        with self.__lock:
+            finished = self.__finished
+            self.__finished = []
+            return finished, bool(self.__in_flight)
+
+    @property
+    def busy(self) -> bool:
+        with self.__lock:
+            return bool(self.__in_flight)
+
+    def __file(self, digest: str) -> str:
+        return os.path.join(self.path, f"{digest}-{self.size[0]}x{self.size[1]}.png")
+
+    def __load(self, digest: str, source_path: str):
+        image = None
+        try:
+            image = self.__load_file(digest)
+            if image is None:
+                image = make_thumbnail(source_path, self.size)
+                self.__store(digest, image)
+        except (OSError, SyntaxError) as e:
+            print(f"Warning: Could not create thumbnail for {source_path}: {e}")
+        finally:
+            with self.__lock:
+                self.__in_flight.pop(digest, None)
+                if image is not None:
+                    self.__memory.put(digest, image)
+                    self.__finished.append((digest, image))
+
+    def __load_file(self, digest: str) -> Optional[Image.Image]:
+        try:
+            with Image.open(self.__file(digest)) as image:
+                image.load()
+                return image
+        except OSError:
+            return None
+
+    def __store(self, digest: str, image: Image.Image):
+        path = self.__file(digest)
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            with atomic_write(path) as f:
+                image.save(f, format="PNG")
+        except OSError as e:
+            print(f"Warning: Could not write thumbnail cache: {e}")
@@ -1,5 +1,7 @@
+import copy
 import os
 import pathlib
+import threading
 from datetime import datetime
 from tkinter.filedialog import askopenfilename, askopenfilenames, asksaveasfilename
 from typing import Callable, Optional
@@ -8,13 +10,35 @@ import customtkinter as ctk
 from CTkMessagebox import CTkMessagebox
 from PIL.Image import Image
 
-from src.engine import Engine
+from src.browser import BadgeBrowser
+from src.cache import image_dimensions, is_within
+from src.config import (
+    DEFAULT_BACKGROUND_PATH,
+    DEFAULT_BADGE_PATH,
+    DEFAULT_EXPORT_PATH,
+    DEFAULT_PRESET_PATH,
+    EXPORT_DATE_FORMAT,
+    export_file_name,
+)
+from src.engine import PREVIEW_SNAPSHOT_BYTES, Engine
+from src.export_queue import ExportJob, ExportQueue, ExportResult
+from src.exports import ExportManifest
+from src.library import BadgeLibrary
 from src.models import Badge, BadgeRow, LeatherBand
-
-DEFAULT_PRESET_PATH = os.path.join(os.getcwd(), "presets/")
-DEFAULT_EXPORT_PATH = os.path.join(os.getcwd(), "output/")
-DEFAULT_BADGE_PATH = os.path.join(os.getcwd(), "input/badges/")
-DEFAULT_BACKGROUND_PATH = os.path.join(os.getcwd(), "input/backgrounds/")
+from src.polling import Poller
+from src.preview import PreviewRenderer
+from src.preview_surface import PreviewSurface
+from src.thumbnails import ThumbnailCache
+from src.watcher import FileWatcher, invalidate_files
+
+# Milliseconds between checks for a finished preview render
+PREVIEW_POLL_INTERVAL = 15
+# Space around the preview image inside the preview panel
+PREVIEW_PADDING = 5
+# Milliseconds between checks for finished exports
+EXPORT_POLL_INTERVAL = 100
+# Interval in ms to collect changes of the input folders
+WATCH_POLL_INTERVAL = 250
 
 
 def select_image(self, title: str, initialdir: str):
@@ -161,6 +185,10 @@ class BadgeListElement:
     def refresh_ui(self):
         self._refresh_buttons()
 
+    def set_position(self, index: int, length: int):
+        self.index = index
+        self.length = length
+
     def _up(self):
         if self.on_up:
             self.on_up(self.index)
@@ -178,6 +206,58 @@ class BadgeListElement:
             self.on_delete(self.index)
 
 
+class KeyedFrameList:
+    """One frame per list item, keyed by the identity of the item.
+
+    refresh() reuses the frames of items that are still in the list and only
+    creates or destroys frames for inserted or removed items. Reused frames
+    get their new index and length, and only frames from the first changed
+    position on are packed again.
+    """
+
+    def __init__(
+        self,
+        create: Callable[[object, int, int], BadgeListElement],
+        pack: Callable[[BadgeListElement, int], None],
+    ):
+        self.__create = create
+        self.__pack = pack
+        self.__frames: dict[int, BadgeListElement] = {}
+        self.__order: list[BadgeListElement] = []
+
+    def refresh(self, items: list):
+        length = len(items)
+        frames = {}
+        order = []
+        for index, item in enumerate(items):
+            frame = self.__frames.pop(id(item), None)
+            if frame is None:
+                frame = self.__create(item, index, length)
+            else:
+                frame.set_position(index, length)
+                frame.refresh_ui()
+            frames[id(item)] = frame
+            order.append(frame)
+
+        for frame in self.__frames.values():
+            frame.destroy()  # pyright: ignore[reportAttributeAccessIssue]
+
+        first = 0
+        while (
+            first < min(len(order), len(self.__order))
+            and order[first] is self.__order[first]
+        ):
+            first += 1
+        for frame in self.__order[first:]:
+            if frame.winfo_exists():  # pyright: ignore[reportAttributeAccessIssue]
+                frame.pack_forget()  # pyright: ignore[reportAttributeAccessIssue]
+        for index in range(first, len(order)):
+            self.__pack(order[index], index)
+
+        self.__frames = frames
+        self.__order = order
+
+
 class BadgeRowFrame(ctk.CTkFrame, BadgeListElement):
     def __init__(
         self,
@@ -212,27 +292,32 @@ class BadgeRowFrame(ctk.CTkFrame, BadgeListElement):
         self.badges_list.grid(row=1, columnspan=5, padx=0, pady=0, sticky="ew")
 
         self.badges_list.grid_columnconfigure(0, weight=1)
+        self.badge_frames = KeyedFrameList(
+            self.__create_badge_frame, self.__pack_badge_frame
+        )
 
         self.refresh_ui()
 
+    def __create_badge_frame(self, badge, index: int, length: int):
+        return BadgeFrame(
+            self.badges_list,
+            badge,
+            index,
+            length,
+            self._on_badge_up,
+            self._on_badge_down,
+            self._on_badge_change,
+            None,
+        )
+
+    def __pack_badge_frame(self, badge_frame, index: int):
+        if index == 0:
+            badge_frame.pack(padx=5, pady=5, side="bottom", fill="x")
+        else:
+            badge_frame.pack(padx=5, pady=(5, 0), side="bottom", fill="x")
+
     def _refresh_badges_list(self):
-        for widget in self.badges_list.winfo_children():
-            widget.destroy()
-        for i, badge in enumerate(self.badge_row.badges):
-            badge_frame = BadgeFrame(
-                self.badges_list,
-                badge,
-                i,
-                len(self.badge_row.badges),
-                self._on_badge_up,
-                self._on_badge_down,
-                self._on_badge_change,
-                None,
-            )
-            if i == 0:
-                badge_frame.pack(padx=5, pady=5, side="bottom", fill="x")
-            else:
-                badge_frame.pack(padx=5, pady=(5, 0), side="bottom", fill="x")
+        self.badge_frames.refresh(self.badge_row.badges)
 
     def refresh_ui(self):
         self._refresh_badges_list()
@@ -296,9 +381,17 @@ class BadgeFrame(ctk.CTkFrame, BadgeListElement):
         if self.on_delete is not None:
             self.btn_del.grid(row=0, column=4, padx=(0, 5))
 
+    def refresh_ui(self):
+        self.label.configure(text=self.badge.name)
+        self._refresh_buttons()
+
     def _change(self):
-        self.badge.select_image(title="Select Badge", initialdir=DEFAULT_BADGE_PATH)
-        super()._change()
+        assert app is not None
+        app.browse_badges("Select Badge", 1, self.__on_select)
+
+    def __on_select(self, paths: list[str]):
+        self.badge.image_path = paths[0]
+        BadgeListElement._change(self)
 
 
 class App(ctk.CTk):
@@ -307,7 +400,22 @@ class App(ctk.CTk):
 
         self.band = LeatherBand()
         self.preview_image: Optional[Image] = None
-        self.engine = Engine(self.band)
+        self.engine = Engine(self.band, snapshot_bytes=PREVIEW_SNAPSHOT_BYTES)
+        # Guards the engine state shared with the preview render thread
+        self.engine_lock = threading.Lock()
+        self.preview_renderer = PreviewRenderer(self.__render_preview)
+        self.badge_library = BadgeLibrary()
+        self.thumbnail_cache = ThumbnailCache()
+        self.export_queue = ExportQueue(ExportManifest(DEFAULT_EXPORT_PATH))
+        # job id -> badges of the band at the time the export was started,
+        # in the order of the exported copy
+        self.__export_badges: dict[int, list[Badge | BadgeRow]] = {}
+        self.__export_poller = Poller(self, EXPORT_POLL_INTERVAL, self.__poll_exports)
+        self.file_watcher = FileWatcher([DEFAULT_BADGE_PATH, DEFAULT_BACKGROUND_PATH])
+        self.__preview_scheduled = False
+        self.__preview_poller = Poller(
+            self, PREVIEW_POLL_INTERVAL, self.__poll_preview
+        )
 
         self.title("LeatherBand")
         self.geometry("600x800")
@@ -511,6 +619,9 @@ class App(ctk.CTk):
             pady=(self.padding / 2, 0),
             sticky="nsew",
         )
+        self.badge_frames = KeyedFrameList(
+            self.__create_badge_frame, self.__pack_badge_frame
+        )
 
         # 3. Bottom Section - Export
         self.btn_export = ctk.CTkButton(
@@ -536,64 +647,179 @@ class App(ctk.CTk):
         self.preview_panel.grid_rowconfigure(0, weight=1)
         self.preview_panel.grid_columnconfigure(0, weight=1)
 
-        self.lbl_preview = ctk.CTkLabel(self.preview_panel, text="Preview")
-        self.lbl_preview.grid(row=0, column=0, padx=5, pady=5)
+        self.preview_surface = PreviewSurface(
+            self.preview_panel,
+            background=self.preview_panel._apply_appearance_mode(
+                self.preview_panel.cget("fg_color")
+            ),
+        )
+        self.preview_surface.grid(
+            row=0, column=0, padx=PREVIEW_PADDING, pady=PREVIEW_PADDING, sticky="nsew"
+        )
+        self.preview_surface.on_zoom = self._on_preview_zoom
+
+        self.preview_controls = ctk.CTkFrame(self.preview_panel, fg_color="transparent")
+        self.preview_controls.grid(
+            row=1, column=0, padx=self.padding, pady=(0, self.padding), sticky="ew"
+        )
+        self.preview_controls.grid_columnconfigure(0, weight=1)
+
+        # Proxy mode renders the preview at the size of the panel, export
+        # always renders at full resolution
+        self.var_proxy_preview = ctk.BooleanVar(value=True)
+        self.sw_proxy_preview = ctk.CTkSwitch(
+            self.preview_controls,
+            text="Fit preview to panel",
+            variable=self.var_proxy_preview,
+            command=self.refresh_preview,
+        )
+        self.sw_proxy_preview.grid(row=0, column=0, sticky="w")
+
+        # Zooming only rescales the last render, it never renders again
+        self.btn_zoom_out = ctk.CTkButton(
+            self.preview_controls,
+            text="-",
+            width=30,
+            command=lambda: self.preview_surface.set_zoom(
+                self.preview_surface.zoom - 1
+            ),
+        )
+        self.btn_zoom_out.grid(row=0, column=1, padx=(self.padding, 0))
+        self.lbl_zoom = ctk.CTkLabel(self.preview_controls, text="1x", width=40)
+        self.lbl_zoom.grid(row=0, column=2)
+        self.btn_zoom_in = ctk.CTkButton(
+            self.preview_controls,
+            text="+",
+            width=30,
+            command=lambda: self.preview_surface.set_zoom(
+                self.preview_surface.zoom + 1
+            ),
+        )
+        self.btn_zoom_in.grid(row=0, column=3)
+        self.__preview_panel_size = (0, 0)
+        self.preview_panel.bind("<Configure>", self._on_preview_resize)
 
         self.refresh_elements()
+        self.after(WATCH_POLL_INTERVAL, self.__poll_file_changes)
 
     def refresh_badges_list(self):
-        for widget in self.badges_list.winfo_children():
-            widget.destroy()
-        for i, badge in enumerate(self.band.badges):
-            if isinstance(badge, Badge):
-                badge_ui = BadgeFrame(
-                    self.badges_list,
-                    badge,
-                    i,
-                    len(self.band.badges),
-                    self._on_badge_up,
-                    self._on_badge_down,
-                    self._on_badge_change,
-                    self._on_badge_delete,
-                )
-            else:
-                badge_ui = BadgeRowFrame(
-                    self.badges_list,
-                    badge,
-                    i,
-                    len(self.band.badges),
-                    self._on_badge_up,
-                    self._on_badge_down,
-                    self._on_badge_change,
-                    self._on_badge_delete,
-                )
-            badge_ui.pack(fill="x", side="bottom", pady=5)
+        self.badge_frames.refresh(self.band.badges)
+
+    def __create_badge_frame(self, badge, index: int, length: int):
+        frame_type = BadgeFrame if isinstance(badge, Badge) else BadgeRowFrame
+        return frame_type(
+            self.badges_list,
+            badge,
+            index,
+            length,
+            self._on_badge_up,
+            self._on_badge_down,
+            self._on_badge_change,
+            self._on_badge_delete,
+        )
+
+    def __pack_badge_frame(self, badge_ui, index: int):
+        badge_ui.pack(fill="x", side="bottom", pady=5)
+
+    def __render_preview(
+        self, band: LeatherBand, max_size: Optional[tuple[int, int]]
+    ) -> Optional[Image]:
+        # Runs on the preview render thread
+        with self.engine_lock:
+            return self.engine.create_band_image(band, max_size)
+
+    def __get_preview_max_size(self) -> Optional[tuple[int, int]]:
+        if not self.var_proxy_preview.get():
+            return None
+        width = self.preview_surface.winfo_width()
+        height = self.preview_surface.winfo_height()
+        if width <= 1 or height <= 1:
+            # Not laid out yet
+            return None
+        return width, height
+
+    def _on_preview_resize(self, event):
+        if not self.var_proxy_preview.get():
+            return
+        size = (event.width, event.height)
+        if size != self.__preview_panel_size:
+            self.__preview_panel_size = size
+            self.refresh_preview()
 
     def refresh_preview(self):
+        # Coalesce bursts of change events into one render per idle cycle
+        if not self.__preview_scheduled:
+            self.__preview_scheduled = True
+            self.after_idle(self.__start_preview_render)
+
+    def __start_preview_render(self):
+        self.__preview_scheduled = False
         if (
             self.band.image_path is None
             or self.band.image_path == ""
             or self.band.image_path == ()
         ):
+            self.preview_renderer.cancel()
             self.preview_image = None
-            self.lbl_preview.configure(image="", text="No Background image selected")
+            self.preview_surface.set_image(None, "No Background image selected")
             return
-        try:
-            self.preview_image = self.engine.create_band_image()
-        except FileNotFoundError as e:
+        self.preview_renderer.request(
+            copy.deepcopy(self.band), self.__get_preview_max_size()
+        )
+        self.__preview_poller.start()
+
+    def __poll_preview(self) -> bool:
+        result, busy = self.preview_renderer.poll()
+        if result is not None:
+            self.__show_preview(result.image, result.error)
+        return busy
+
+    def __show_preview(self, image: Optional[Image], error: Optional[Exception]):
+        if isinstance(error, FileNotFoundError):
             self.preview_image = None
-            self.lbl_preview.configure(image=None, text="No Preview")
-            CTkMessagebox(app, title="Error", message=str(e), icon="cancel")
+            self.preview_surface.set_image(None, "No Preview")
+            CTkMessagebox(app, title="Error", message=str(error), icon="cancel")
             return
-        if self.preview_image is None:
-            self.lbl_preview.configure(image="", text="No Preview")
-        else:
-            ctk_image = ctk.CTkImage(
-                light_image=self.preview_image,
-                dark_image=self.preview_image,
-                size=self.preview_image.size,
+        if error is not None:
+            raise error
+        self.preview_image = image
+        self.preview_surface.set_image(image, "No Preview")
+
+    def __poll_file_changes(self):
+        changed = self.file_watcher.poll()
+        if changed:
+            self.__on_files_changed(changed)
+        self.after(WATCH_POLL_INTERVAL, self.__poll_file_changes)
+
+    def __on_files_changed(self, changed: set[str]):
+        invalidate_files(changed)
+
+        def affected(path: str) -> bool:
+            return bool(path) and any(
+                is_within(os.path.abspath(path), c) for c in changed
             )
-            self.lbl_preview.configure(image=ctk_image, text="")
+
+        badges_changed = False
+        for item in self.band.badges:
+            badges = item.badges if isinstance(item, BadgeRow) else [item]
+            if any(affected(badge.image_path) for badge in badges):
+                # The new file has to be checked again on export
+                item.scale_warning_showed = False
+                badges_changed = True
+        background_changed = affected(self.band.image_path)
+        if background_changed:
+            with self.engine_lock:
+                try:
+                    self.engine.update_background()
+                except FileNotFoundError:
+                    # Shown by the label and the next preview
+                    pass
+            self.refresh_elements()
+        if background_changed or badges_changed:
+            self.refresh_preview()
+
+    def _on_preview_zoom(self, zoom: int):
+        self.lbl_zoom.configure(text=f"{zoom}x")
 
     def refresh_elements(self):
         self.var_bg_path.set(self.band.image_path)
@@ -621,11 +847,12 @@ class App(ctk.CTk):
             return
         self.var_preset.set(path)
         self.band = band
-        try:
-            self.engine.set_band(band)
-        except FileNotFoundError as e:
-            CTkMessagebox(title="error", message=f"{e}", icon="cancel")
-        self.engine.set_name(pathlib.Path(path).stem)
+        with self.engine_lock:
+            try:
+                self.engine.set_band(band)
+            except FileNotFoundError as e:
+                CTkMessagebox(title="error", message=f"{e}", icon="cancel")
+            self.engine.set_name(pathlib.Path(path).stem)
         self.refresh_ui()
 
     def new_preset(self):
@@ -634,7 +861,8 @@ class App(ctk.CTk):
         )
         if path is None:
             return
-        self.engine.set_name(pathlib.Path(path).stem)
+        with self.engine_lock:
+            self.engine.set_name(pathlib.Path(path).stem)
         self.var_preset.set(path)
         self.refresh_ui()
 
@@ -643,10 +871,11 @@ class App(ctk.CTk):
             title="Select Background",
             initialdir=DEFAULT_BACKGROUND_PATH,
         )
-        try:
-            self.engine.update_background()
-        except FileNotFoundError as e:
-            CTkMessagebox(title="error", message=f"{e}", icon="cancel")
+        with self.engine_lock:
+            try:
+                self.engine.update_background()
+            except FileNotFoundError as e:
+                CTkMessagebox(title="error", message=f"{e}", icon="cancel")
         self.refresh_preview()
         self.refresh_elements()
 
@@ -656,12 +885,48 @@ class App(ctk.CTk):
         self.refresh_preview()
         self.refresh_elements()
 
-    def add_badge(self):
-        badge = Badge()
-        badge.select_image(  # pyright: ignore[reportAttributeAccessIssue]
-            title="Select Image",
-            initialdir=DEFAULT_BADGE_PATH,
+    def browse_badges(
+        self, title: str, num: int, on_select: Callable[[list[str]], None]
+    ):
+        try:
+            background_width = image_dimensions(self.band.image_path)[0]
+        except (OSError, SyntaxError):
+            background_width = None
+        BadgeBrowser(
+            self,
+            self.badge_library,
+            self.thumbnail_cache,
+            title,
+            num,
+            on_select,
+            open_file=lambda: self.__select_badge_files(title, num, on_select),
+            background_width=background_width,
         )
+
+    def __select_badge_files(
+        self, title: str, num: int, on_select: Callable[[list[str]], None]
+    ):
+        # The file dialog, for badges outside the badge folder
+        if num == 1:
+            badge = Badge()
+            badge.select_image(  # pyright: ignore[reportAttributeAccessIssue]
+                title=title, initialdir=DEFAULT_BADGE_PATH
+            )
+            paths = [badge.image_path] if badge.image_path else []
+        else:
+            badge_row = BadgeRow()
+            badge_row.select_images(  # pyright: ignore[reportAttributeAccessIssue]
+                title=title, initialdir=DEFAULT_BADGE_PATH, num=num
+            )
+            paths = [badge.image_path for badge in badge_row.badges]
+        if len(paths) == num:
+            on_select(paths)
+
+    def add_badge(self):
+        self.browse_badges("Select Image", 1, self.__add_badge)
+
+    def __add_badge(self, paths: list[str]):
+        badge = Badge(paths[0])
         self.band.badges.append(badge)
         message = self.engine.check_badge_scaling(badge)
         if message:
@@ -670,12 +935,10 @@ class App(ctk.CTk):
         self.refresh_preview()
 
     def add_badge_row(self):
-        badge_row = BadgeRow()
-        badge_row.select_images(  # pyright: ignore[reportAttributeAccessIssue]
-            title="Select Images",
-            initialdir=DEFAULT_BADGE_PATH,
-            num=2,
-        )
+        self.browse_badges("Select Images", 2, self.__add_badge_row)
+
+    def __add_badge_row(self, paths: list[str]):
+        badge_row = BadgeRow([Badge(path) for path in paths])
         self.band.badges.append(badge_row)
         message = self.engine.check_badge_row_scaling(badge_row)
         if message:
@@ -720,33 +983,13 @@ class App(ctk.CTk):
         self.refresh_preview()
         self.refresh_badges_list()
 
-    def __check_all_badges_scaling(self):
-        for badge in self.band.badges:
-            if isinstance(badge, Badge):
-                message = self.engine.check_badge_scaling(badge)
-                if message:
-                    CTkMessagebox(app, title="warning", message=message, icon="warning")
-            elif isinstance(badge, BadgeRow):
-                message = self.engine.check_badge_row_scaling(badge)
-                if message:
-                    CTkMessagebox(app, title="warning", message=message, icon="warning")
-
     def export_image(self):
-        date = datetime.now().strftime("%Y-%m-%d")
+        date = datetime.now().strftime(EXPORT_DATE_FORMAT)
         file_name = f"{date}"
-        if self.preview_image is None:
-            CTkMessagebox(app, title="Export Error", message="No image to export")
-            return
+        preset_path = None
         if os.path.exists(self.var_preset.get()):
-            try:
-                self.band.save_to_file(self.var_preset.get())
-                preset_name = pathlib.Path(self.var_preset.get()).stem
-                file_name = f"{date} {preset_name}.png"
-            except Exception as e:
-                CTkMessagebox(
-                    app, title="Export Error", message=f"Failed to save preset: {e}"
-                )
-                return
+            preset_path = self.var_preset.get()
+            file_name = export_file_name(date, pathlib.Path(preset_path).stem)
         else:
             CTkMessagebox(
                 app,
@@ -754,24 +997,66 @@ class App(ctk.CTk):
                 message="Preset file not found. Savind without preset",
                 icon="warning",
             )
-            preset_name = "default"
 
-        path = os.path.join(DEFAULT_EXPORT_PATH, file_name)
-        try:
-            self.preview_image.save(path, format="PNG")
-        except Exception as e:
-            CTkMessagebox(
-                app, title="Export Error", message=f"Failed to export image: {e}"
-            )
+        # Rendered, saved and checked on the export thread from a copy, so
+        # the band can be edited or replaced right away
+        job = ExportJob(
+            copy.deepcopy(self.band),
+            self.engine.name,
+            os.path.join(DEFAULT_EXPORT_PATH, file_name),
+            preset_path,
+        )
+        job_id = self.export_queue.submit(job)
+        self.__export_badges[job_id] = list(self.band.badges)
+        self.__refresh_export_button(self.export_queue.pending)
+        self.__export_poller.start()
+
+    def __refresh_export_button(self, pending: int):
+        text = "Export Image and Save Preset"
+        if pending:
+            text += f" ({pending} running)"
+        self.btn_export.configure(text=text)
+
+    def __poll_exports(self) -> bool:
+        results, pending = self.export_queue.poll()
+        for result in results:
+            self.__show_export_result(result)
+        self.__refresh_export_button(pending)
+        return pending > 0
+
+    def __show_export_result(self, result: ExportResult):
+        badges = self.__export_badges.pop(result.job_id, [])
+        if result.error is not None:
+            CTkMessagebox(app, title="Export Error", message=str(result.error))
             return
 
+        preset_name = "default"
+        if result.job.preset_path is not None:
+            preset_name = pathlib.Path(result.job.preset_path).stem
+        if result.skipped:
+            message = f'Image "{result.path}" is up to date.'
+        else:
+            message = f'Image exported to "{result.path}".'
         CTkMessagebox(
             app,
             title="Export",
-            message=f'Image exported to "{path}".\nPreset saved to "{preset_name}"',
+            message=f'{message}\nPreset saved to "{preset_name}"',
         )
 
-        self.__check_all_badges_scaling()
+        for index, warning in result.warnings:
+            # Warn only once per badge. Warnings refer to the exported copy,
+            # the live badge may have been moved or removed since.
+            badge = badges[index] if index < len(badges) else None
+            if badge is not None and any(badge is b for b in self.band.badges):
+                badge.scale_warning_showed = True
+            CTkMessagebox(app, title="warning", message=warning, icon="warning")
+
+
+# Root window, created by main() and used as master for message boxes
+app: Optional[App] = None
 
 
-app = App()
+def main():
+    global app
+    app = App()
+    app.mainloop()
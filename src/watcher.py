@@ -0,0 +1,249 @@
+"""Watches the input folders for edited images.
+
+Artists replace badge and background PNGs while a preset is open. The
+watcher reports changed paths, and invalidate_files drops only the cache
+entries that were built from them, so everything else stays warm. Changes
+are read with inotify where available, otherwise the folders are polled.
+Like the other workers, the watcher thread never touches Tk; the UI
+collects changes with poll().
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Hashable, Iterable, Optional
+
+from .buttonhole import buttonhole_cache
+from .cache import forget_files, image_cache, is_within
+from .models import BadgeRow
+from .scaling import scaled_layer_cache
+from .text import name_layer_cache
+
+# Quiet time before a burst of events is reported, editors often write a
+# file in several steps
+DEBOUNCE_SECONDS = 0.3
+POLL_SECONDS = 1.0
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (
+    IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+)
+# struct inotify_event without the name: wd, mask, cookie, len
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def _source_paths(source_key: Hashable) -> list[str]:
+    """Files of a scaled layer source key, see Engine.__layer_source_key."""
+    kind, keys = source_key  # pyright: ignore[reportGeneralTypeIssues]
+    if kind is BadgeRow:
+        return [key[0] for key in keys]
+    return [keys[0]]
+
+
+def invalidate_files(paths: Iterable[str]):
+    """Drop the cached results built from the given files or directories."""
+    changed = [os.path.abspath(path) for path in paths]
+    if not changed:
+        return
+
+    def affected(abs_path: str) -> bool:
+        return any(is_within(abs_path, path) for path in changed)
+
+    image_cache.remove_matching(lambda key: affected(key[0]))  # pyright: ignore[reportIndexIssue]
+    scaled_layer_cache.remove_matching(
+        lambda key: any(affected(p) for p in _source_paths(key[0]))  # pyright: ignore[reportIndexIssue]
+    )
+    digests = set()
+    for path in changed:
+        digests.update(forget_files(path))
+    for digest in digests:
+        buttonhole_cache.invalidate(digest)
+    # Name layers are keyed by the background digest last
+    name_layer_cache.remove_matching(lambda key: key[-1] in digests)  # pyright: ignore[reportIndexIssue]
+
+
+class _InotifyBackend:
+    name = "inotify"
+
+    def __init__(self, roots: list[str]):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.__add_watch = libc.inotify_add_watch
+        self.__add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.__fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.__fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.roots = roots
+        # watch descriptor -> directory
+        self.__dirs: dict[int, str] = {}
+        try:
+            for root in roots:
+                if os.path.isdir(root):
+                    self.__watch_tree(root)
+        except OSError:
+            os.close(self.__fd)
+            raise
+
+    def __watch_tree(self, root: str):
+        for dirpath, _, _ in os.walk(root):
+            wd = self.__add_watch(self.__fd, os.fsencode(dirpath), WATCH_MASK)
+            if wd < 0:
+                # Usually the per-user watch limit
+                raise OSError(ctypes.get_errno(), f"Cannot watch {dirpath}")
+            self.__dirs[wd] = dirpath
+
+    def read(self, timeout: float) -> list[str]:
+        ready, _, _ = select.select([self.__fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.__fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        changed = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost, only the folders are known to have changed
+                changed.extend(self.roots)
+                continue
+            if mask & IN_IGNORED:
+                self.__dirs.pop(wd, None)
+                continue
+            directory = self.__dirs.get(wd)
+            if directory is None:
+                continue
+            path = os.path.join(directory, os.fsdecode(name)) if name else directory
+            changed.append(path)
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                try:
+                    self.__watch_tree(path)
+                except OSError:
+                    pass
+        return changed
+
+    def close(self):
+        os.close(self.__fd)
+
+
+class _PollingBackend:
+    name = "polling"
+
+    def __init__(self, roots: list[str]):
+        self.roots = roots
+        self.__files = self.__scan()
+
+    def __scan(self) -> dict[str, tuple[int, int]]:
+        files = {}
+        for root in self.roots:
+            for dirpath, _, filenames in os.walk(root):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    files[path] = (st.st_mtime_ns, st.st_size)
+        return files
+
+    def read(self, timeout: float) -> list[str]:
+        time.sleep(max(timeout, POLL_SECONDS))
+        files = self.__scan()
+        previous = self.__files
+        self.__files = files
+        return [
+            path
+            for path in previous.keys() | files.keys()
+            if previous.get(path) != files.get(path)
+        ]
+
+    def close(self):
+        pass
+
+
+def _create_backend(roots: list[str]):
+    if sys.platform.startswith("linux"):
+        try:
+            return _InotifyBackend(roots)
+        except (OSError, AttributeError) as e:
+            print(f"Warning: inotify unavailable, polling input folders: {e}")
+    return _PollingBackend(roots)
+
+
+class FileWatcher:
+    """Reports changed files below the given directories.
+
+    Bursts of events are collected until they have been quiet for
+    DEBOUNCE_SECONDS and then handed out together by poll().
+    """
+
+    def __init__(self, roots: list[str]):
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.__lock = threading.Lock()
+        self.__changes: set[str] = set()
+        self.__stopped = threading.Event()
+        self.__backend = _create_backend(self.roots)
+        self.__thread = threading.Thread(
+            target=self.__run, name="file-watcher", daemon=True
+        )
+        self.__thread.start()
+
+    @property
+    def backend(self) -> str:
+        return self.__backend.name
+
+    def poll(self) -> set[str]:
+        """Return the absolute paths changed since the last call."""
+        with self.__lock:
+            changes = self.__changes
+            self.__changes = set()
+        return changes
+
+    def stop(self):
+        self.__stopped.set()
+
+    def __run(self):
+        pending: set[str] = set()
+        last_event: Optional[float] = None
+        try:
+            while not self.__stopped.is_set():
+                timeout = DEBOUNCE_SECONDS if pending else POLL_SECONDS
+                changed = self.__backend.read(timeout)
+                now = time.monotonic()
+                if changed:
+                    pending.update(changed)
+                    last_event = now
+                elif pending and last_event is not None:
+                    if now - last_event >= DEBOUNCE_SECONDS:
+                        with self.__lock:
+                            self.__changes |= pending
+                        pending = set()
+        finally:
+            self.__backend.close()
@@ -0,0 +1,6 @@
+import multiprocessing
+
+# Tests start worker threads (prefetch, preview, exports) before process
+# pools are created. Forked workers would inherit their half-finished
+# state, so start pools like Python 3.14 does by default on Linux.
+multiprocessing.set_start_method("forkserver", force=True)
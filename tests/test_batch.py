@@ -0,0 +1,29 @@
+import os
+
+from benchmarks.corpus import generate_corpus
+from src.batch import render_presets
+from src.buttonhole import buttonhole_cache
+from src.exports import read_render_key
+
+
+def test_skips_unchanged_presets(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # Cache paths are fixed at import, keep them out of the project
+    monkeypatch.setattr(buttonhole_cache, "path", str(tmp_path / "buttonholes"))
+    presets = generate_corpus(str(tmp_path), 3, badges_per_preset=2)
+    invalid = os.path.join("presets", "invalid.json")
+    with open(invalid, "wb") as f:
+        f.write(b"\xff")
+    presets.append(invalid)
+
+    exported, skipped, failed = render_presets(presets, "output", max_workers=2)
+    assert len(exported) == 3 and skipped == []
+    assert [path for path, _ in failed] == [invalid]
+    assert all(read_render_key(path) for path in exported)
+
+    exported, skipped, failed = render_presets(presets, "output", max_workers=2)
+    assert exported == [] and skipped == presets[:3]
+    assert [path for path, _ in failed] == [invalid]
+
+    exported, skipped, _ = render_presets(presets, "output", 2, force=True)
+    assert len(exported) == 3 and skipped == []
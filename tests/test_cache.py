@@ -0,0 +1,36 @@
+import os
+
+import pytest
+
+from src.cache import atomic_write
+
+
+def test_atomic_write_replaces_file(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_text("old")
+    with atomic_write(str(path), "w") as f:
+        f.write("new")
+        assert path.read_text() == "old"
+    assert path.read_text() == "new"
+    assert os.listdir(tmp_path) == ["data.json"]
+
+
+def test_atomic_write_removes_temporary_file_on_error(tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(b"old")
+    with pytest.raises(OSError):
+        with atomic_write(str(path)) as f:
+            f.write(b"partial")
+            raise OSError("disk full")
+    assert path.read_bytes() == b"old"
+    assert os.listdir(tmp_path) == ["data.bin"]
+
+
+def test_atomic_write_removes_temporary_file_if_replace_fails(tmp_path):
+    # A directory cannot be replaced by a file
+    path = tmp_path / "target"
+    path.mkdir()
+    with pytest.raises(OSError):
+        with atomic_write(str(path)) as f:
+            f.write(b"data")
+    assert os.listdir(tmp_path) == ["target"]
@@ -0,0 +1,105 @@
+import json
+
+import pytest
+
+from src.codec import (
+    SCHEMA_VERSION,
+    PresetError,
+    decode_band,
+    dumps,
+    load_presets,
+    loads,
+)
+from src.models import Badge, BadgeRow, LeatherBand
+
+
+def make_band() -> LeatherBand:
+    band = LeatherBand()
+    band.image_path = "input/backgrounds/Band.png"
+    band.margin = 8
+    band.badges = [
+        Badge("input/badges/A.png"),
+        BadgeRow([Badge("input/badges/B.png"), Badge("input/badges/Ä C.png")]),
+        Badge(""),
+        BadgeRow([]),
+    ]
+    return band
+
+
+def test_round_trip():
+    band = make_band()
+    assert loads(dumps(band)) == band
+
+
+def test_round_trip_empty_band():
+    band = LeatherBand()
+    assert loads(dumps(band)) == band
+
+
+def test_matches_dataclasses_json():
+    band = make_band()
+    text = band.to_json()  # pyright: ignore[reportAttributeAccessIssue]
+    assert loads(text) == LeatherBand.from_json(text)  # pyright: ignore[reportAttributeAccessIssue]
+    # dataclasses_json ignores the version key of new files
+    assert LeatherBand.from_json(dumps(band)) == band  # pyright: ignore[reportAttributeAccessIssue]
+
+
+def test_version():
+    assert json.loads(dumps(LeatherBand()))["version"] == SCHEMA_VERSION
+    assert loads('{"version": 1.0}') == LeatherBand()
+    with pytest.raises(PresetError):
+        loads(json.dumps({"version": SCHEMA_VERSION + 1}))
+
+
+def test_integral_float_margin():
+    assert loads('{"margin": 6.0}').margin == 6
+    with pytest.raises(PresetError):
+        loads('{"margin": 6.5}')
+
+
+def test_null_paths():
+    band = loads('{"image_path": null, "badges": [{"image_path": null}]}')
+    assert band.image_path == ""
+    assert band.badges == [Badge("")]
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "[]",
+        '{"margin": true}',
+        '{"margin": "6"}',
+        '{"badges": {}}',
+        '{"badges": [1]}',
+        '{"badges": [{"badges": [{"image_path": 1}]}]}',
+        "{",
+    ],
+)
+def test_invalid(text):
+    with pytest.raises(PresetError):
+        loads(text)
+
+
+def test_decode_band_reports_field():
+    with pytest.raises(PresetError, match=r"badges\[0\]\.badges\[1\]\.image_path"):
+        decode_band({"badges": [{"badges": [{}, {"image_path": 2}]}]})
+
+
+def test_invalid_encoding():
+    with pytest.raises(PresetError):
+        loads(b'{"image_path": "\xff"}')
+
+
+def test_load_presets_returns_errors(tmp_path):
+    valid = tmp_path / "a.json"
+    valid.write_text(dumps(make_band()))
+    invalid = tmp_path / "b.json"
+    invalid.write_bytes(b"\xff")
+    missing = tmp_path / "c.json"
+    paths = [str(valid), str(invalid), str(missing)]
+
+    loaded = load_presets(paths, max_workers=2)
+    assert [preset.path for preset in loaded] == paths
+    assert loaded[0].band == make_band() and loaded[0].error is None
+    assert loaded[1].band is None and isinstance(loaded[1].error, PresetError)
+    assert loaded[2].band is None and isinstance(loaded[2].error, OSError)
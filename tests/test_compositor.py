@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.compositor import composite_layers
+
+
+def random_image(rng, width, height, opaque=False) -> Image.Image:
+    pixels = rng.integers(0, 256, (height, width, 4), dtype=np.uint8)
+    if opaque:
+        pixels[..., 3] = 255
+    return Image.fromarray(pixels)
+
+
+def composite_with_pil(base, layers) -> Image.Image:
+    result = base.copy()
+    for image, x, y in layers:
+        layer = Image.new("RGBA", result.size, (0, 0, 0, 0))
+        layer.paste(image, (x, y))
+        result = Image.alpha_composite(result, layer)
+    return result
+
+
+def premultiplied(image: Image.Image) -> np.ndarray:
+    pixels = np.asarray(image, dtype=np.float64)
+    pixels[..., :3] *= pixels[..., 3:4] / 255
+    return pixels
+
+
+def layers(rng) -> list:
+    return [
+        (random_image(rng, 20, 15), 5, 5),
+        # Clipped at the left, bottom and top right edges
+        (random_image(rng, 30, 30), -10, 20),
+        (random_image(rng, 10, 10), 55, -3),
+        # Outside the canvas
+        (random_image(rng, 5, 5), 100, 100),
+        (random_image(rng, 5, 5), -5, 0),
+    ]
+
+
+def test_opaque_base_matches_pil():
+    rng = np.random.default_rng(0)
+    base = random_image(rng, 60, 40, opaque=True)
+    placed = layers(rng)
+    expected = np.asarray(composite_with_pil(base, placed), dtype=int)
+    result = np.asarray(composite_layers(base, placed), dtype=int)
+    assert np.abs(result - expected).max() <= 1
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_translucent_base_matches_pil(seed):
+    # The color of nearly transparent pixels is imprecise in both, so
+    # compare premultiplied colors
+    rng = np.random.default_rng(seed)
+    base = random_image(rng, 60, 40)
+    placed = layers(rng)
+    expected = premultiplied(composite_with_pil(base, placed))
+    result = premultiplied(composite_layers(base, placed))
+    assert np.abs(result - expected).max() <= 1.5
+
+
+def test_without_layers():
+    rng = np.random.default_rng(1)
+    base = random_image(rng, 8, 8, opaque=True)
+    result = composite_layers(base, [])
+    assert result.mode == "RGBA"
+    assert result.tobytes() == base.tobytes()
+
+
+def test_converts_base():
+    base = Image.new("RGB", (4, 4), (10, 20, 30))
+    layer = Image.new("RGBA", (2, 2), (200, 100, 0, 255))
+    result = composite_layers(base, [(layer, 1, 1)])
+    assert result.getpixel((0, 0)) == (10, 20, 30, 255)
+    assert result.getpixel((1, 1)) == (200, 100, 0, 255)
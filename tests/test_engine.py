@@ -0,0 +1,50 @@
+import copy
+import random
+
+import pytest
+
+from benchmarks.corpus import generate_corpus
+from src.buttonhole import buttonhole_cache
+from src.cache import image_size_in_bytes
+from src.engine import Engine
+from src.models import LeatherBand
+
+
+@pytest.fixture
+def band(tmp_path, monkeypatch) -> LeatherBand:
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(buttonhole_cache, "path", str(tmp_path / "buttonholes"))
+    presets = generate_corpus(str(tmp_path), 1, badges_per_preset=8, seed=3)
+    return LeatherBand.load_from_file(presets[0])
+
+
+def render(band: LeatherBand) -> bytes:
+    engine = Engine(band)
+    engine.set_band(band)
+    engine.set_name("Name")
+    image = engine.create_band_image()
+    assert image is not None
+    return image.tobytes()
+
+
+@pytest.mark.parametrize("frames", [1, 3, 100])
+def test_snapshots_match_full_render(band, frames):
+    engine = Engine(band)
+    engine.set_band(band)
+    engine.set_name("Name")
+    first = engine.create_band_image()
+    assert first is not None
+    # Room for the given number of snapshots, so some layers have none
+    engine.snapshot_bytes = frames * image_size_in_bytes(first)
+
+    rng = random.Random(frames)
+    edited = copy.deepcopy(band)
+    for _ in range(6):
+        if rng.random() < 0.3:
+            edited.margin = rng.randrange(0, 12)
+        else:
+            i, j = rng.sample(range(len(edited.badges)), 2)
+            edited.badges[i], edited.badges[j] = edited.badges[j], edited.badges[i]
+        image = engine.create_band_image(edited)
+        assert image is not None
+        assert image.tobytes() == render(copy.deepcopy(edited))
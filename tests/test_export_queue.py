@@ -0,0 +1,46 @@
+import threading
+import time
+
+from src.export_queue import ExportJob, ExportQueue, ExportResult
+from src.exports import ExportManifest
+from src.models import LeatherBand
+
+
+def test_poll_returns_results_with_pending_count(tmp_path):
+    queue = ExportQueue(ExportManifest(str(tmp_path)))
+    release = threading.Event()
+    started = threading.Event()
+
+    def export(job_id, job):
+        started.set()
+        release.wait()
+        return ExportResult(job_id, job, "band.png", False, [], None)
+
+    queue._ExportQueue__export = export  # pyright: ignore[reportAttributeAccessIssue]
+    job_id = queue.submit(ExportJob(LeatherBand(), "Name", "band.png"))
+    started.wait()
+    assert queue.poll() == ([], 1)
+
+    # The job finishes between two polls; its result comes with the count
+    # that lets the UI stop polling
+    release.set()
+    deadline = time.monotonic() + 5
+    while queue.pending:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+    results, pending = queue.poll()
+    assert pending == 0
+    assert [result.job_id for result in results] == [job_id]
+    assert queue.poll() == ([], 0)
+
+
+def test_failed_job_is_reported(tmp_path):
+    queue = ExportQueue(ExportManifest(str(tmp_path)))
+    queue.submit(ExportJob(LeatherBand(), "Name", str(tmp_path / "band.png")))
+    deadline = time.monotonic() + 5
+    while queue.pending:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+    results, pending = queue.poll()
+    assert pending == 0
+    assert len(results) == 1 and results[0].error is not None
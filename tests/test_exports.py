@@ -0,0 +1,56 @@
+import json
+import os
+
+from PIL import Image
+
+from src.exports import (
+    MANIFEST_FILE_NAME,
+    ExportManifest,
+    ManifestEntry,
+    png_info,
+    read_render_key,
+)
+
+
+def export(path: str, key: str):
+    Image.new("RGBA", (2, 2)).save(path, pnginfo=png_info(key))
+
+
+def test_render_key_round_trip(tmp_path):
+    path = str(tmp_path / "band.png")
+    export(path, "abc")
+    assert read_render_key(path) == "abc"
+    Image.new("RGBA", (2, 2)).save(path)
+    assert read_render_key(path) is None
+    assert read_render_key(str(tmp_path / "missing.png")) is None
+
+
+def test_manifest_round_trip(tmp_path):
+    manifest = ExportManifest(str(tmp_path))
+    path = str(tmp_path / "2026-01-05 Band.png")
+    export(path, "key")
+    manifest.record("Band", path, "key")
+    manifest.save()
+
+    loaded = ExportManifest(str(tmp_path))
+    assert loaded.get("Band") == ManifestEntry("2026-01-05 Band.png", "key")
+    assert loaded.current_export("Band", "key") == path
+    assert loaded.current_export("Band", "other") is None
+    assert loaded.current_export("Other", "key") is None
+
+
+def test_manifest_checks_exported_file(tmp_path):
+    manifest = ExportManifest(str(tmp_path))
+    path = str(tmp_path / "Band.png")
+    export(path, "old")
+    manifest.record("Band", path, "key")
+    assert manifest.current_export("Band", "key") is None
+    os.remove(path)
+    assert manifest.current_export("Band", "key") is None
+
+
+def test_manifest_ignores_invalid_file(tmp_path):
+    manifest_path = tmp_path / MANIFEST_FILE_NAME
+    for content in ("{", "[]", json.dumps({"version": -1, "exports": {}})):
+        manifest_path.write_text(content)
+        assert ExportManifest(str(tmp_path)).get("Band") is None
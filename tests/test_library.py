@@ -0,0 +1,50 @@
+import os
+
+from PIL import Image
+
+from src.library import BadgeLibrary
+
+
+def badge(root, path: str):
+    full = os.path.join(root, *path.split("/"))
+    os.makedirs(os.path.dirname(full), exist_ok=True)
+    Image.new("RGBA", (10, 4)).save(full)
+
+
+def names(entries) -> list[str]:
+    return sorted(entry.path for entry in entries)
+
+
+def test_folder_filter_is_exact(tmp_path):
+    root = tmp_path / "badges"
+    for path in [
+        "Foo_Bar/a.png",
+        "Foo_Bar/sub/b.png",
+        "FooXBar/c.png",
+        "foo_bar/d.png",
+        "Foo_Barn/e.png",
+        "f.png",
+    ]:
+        badge(root, path)
+    library = BadgeLibrary(":memory:", str(root))
+    library.scan(10)
+
+    assert names(library.search(folder="Foo_Bar")) == [
+        "Foo_Bar/a.png",
+        "Foo_Bar/sub/b.png",
+    ]
+    assert names(library.search(folder="Foo_Bar/", recursive=False)) == [
+        "Foo_Bar/a.png"
+    ]
+    assert names(library.search(folder="foo_bar")) == ["foo_bar/d.png"]
+    assert len(library.search(folder="")) == 6
+
+
+def test_name_search_escapes_wildcards(tmp_path):
+    root = tmp_path / "badges"
+    for path in ["a_b.png", "aXb.png", "100%.png"]:
+        badge(root, path)
+    library = BadgeLibrary(":memory:", str(root))
+    library.scan()
+    assert names(library.search("a_b")) == ["a_b.png"]
+    assert names(library.search("%")) == ["100%.png"]
@@ -0,0 +1,50 @@
+from src.polling import Poller
+
+
+class FakeWidget:
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, interval, callback):
+        self.scheduled.append((interval, callback))
+
+    def run(self):
+        while self.scheduled:
+            _, callback = self.scheduled.pop(0)
+            callback()
+
+
+def test_polls_until_idle():
+    widget = FakeWidget()
+    answers = [True, True, False]
+    calls = []
+
+    def poll():
+        calls.append(len(calls))
+        return answers[len(calls) - 1]
+
+    poller = Poller(widget, 10, poll)
+    poller.start()
+    poller.start()
+    assert len(widget.scheduled) == 1
+    widget.run()
+    assert len(calls) == 3
+
+    # Polling can be started again once it stopped
+    answers.append(False)
+    poller.start()
+    widget.run()
+    assert len(calls) == 4
+
+
+def test_error_stops_polling():
+    widget = FakeWidget()
+    poller = Poller(widget, 10, lambda: 1 / 0)
+    poller.start()
+    try:
+        widget.run()
+    except ZeroDivisionError:
+        pass
+    assert widget.scheduled == []
+    poller.start()
+    assert len(widget.scheduled) == 1
@@ -0,0 +1,49 @@
+import threading
+import time
+
+from PIL import Image
+
+from src.models import LeatherBand
+from src.preview import PreviewRenderer
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_poll_returns_result_with_busy_state():
+    release = threading.Event()
+    started = threading.Event()
+    image = Image.new("RGBA", (1, 1))
+
+    def render(band, max_size):
+        started.set()
+        release.wait()
+        return image
+
+    renderer = PreviewRenderer(render)
+    generation = renderer.request(LeatherBand())
+    started.wait()
+    assert renderer.poll() == (None, True)
+
+    # The render finishes between two polls; the result is still handed
+    # out together with the idle state
+    release.set()
+    wait_until(lambda: not renderer.busy)
+    result, busy = renderer.poll()
+    assert not busy
+    assert result is not None
+    assert (result.generation, result.image) == (generation, image)
+    assert renderer.poll() == (None, False)
+
+
+def test_poll_drops_superseded_results():
+    renderer = PreviewRenderer(lambda band, max_size: Image.new("RGBA", (1, 1)))
+    renderer.request(LeatherBand())
+    wait_until(lambda: not renderer.busy)
+    renderer.cancel()
+    wait_until(lambda: not renderer.busy)
+    assert renderer.poll() == (None, False)
@@ -0,0 +1,24 @@
+from src.roster import file_names, read_roster
+
+
+def test_file_names_are_distinct():
+    names = ["A/B", "A_B", "a_b", "C", "...", "c"]
+    assert file_names(names) == [
+        "A_B.png",
+        "A_B (2).png",
+        "a_b (3).png",
+        "C.png",
+        "_.png",
+        "c (2).png",
+    ]
+
+
+def test_read_roster(tmp_path):
+    text = tmp_path / "names.txt"
+    text.write_text("Anna\n\n Ben \nAnna\n", encoding="utf-8")
+    assert read_roster(str(text)) == ["Anna", "Ben"]
+
+    table = tmp_path / "names.csv"
+    table.write_text("Id,Name\n1,Anna\n2,Ben\n", encoding="utf-8")
+    assert read_roster(str(table), "Name") == ["Anna", "Ben"]
+    assert read_roster(str(table)) == ["Id", "1", "2"]
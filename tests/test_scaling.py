@@ -0,0 +1,22 @@
+from PIL import Image
+
+from src.scaling import resample_filter, scale_to_width
+
+
+def test_resample_filter():
+    assert resample_filter(10, 10) is None
+    # Integer upscales keep the pixels crisp
+    assert resample_filter(10, 30) == Image.Resampling.NEAREST
+    # Integer downscales would drop pixels with NEAREST
+    assert resample_filter(30, 10) == Image.Resampling.LANCZOS
+    assert resample_filter(10, 15) == Image.Resampling.LANCZOS
+
+
+def test_integer_downscale_matches_lanczos():
+    image = Image.new("RGBA", (8, 2))
+    image.putdata([(255 * (x % 2), 0, 0, 255) for x in range(8)] * 2)
+    scaled = scale_to_width(image, 4)
+    expected = image.resize((4, 1), Image.Resampling.LANCZOS)
+    assert scaled.size == expected.size
+    assert scaled.tobytes() == expected.tobytes()
+    assert scale_to_width(image, 8) is image
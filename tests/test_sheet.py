@@ -0,0 +1,96 @@
+import io
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from benchmarks.corpus import generate_corpus
+from src import sheet
+from src.buttonhole import buttonhole_cache
+from src.sheet import PngStreamWriter, sheet_layout
+
+
+def random_image(rng, width, height) -> Image.Image:
+    pixels = rng.integers(0, 256, (height, width, 4), dtype=np.uint8)
+    return Image.fromarray(pixels)
+
+
+def test_png_round_trip():
+    rng = np.random.default_rng(0)
+    strips = [random_image(rng, 37, height) for height in (1, 5, 12)]
+    f = io.BytesIO()
+    writer = PngStreamWriter(f, 37, 18, dpi=300)
+    for strip in strips:
+        writer.write_strip(strip)
+    writer.close()
+
+    expected = Image.new("RGBA", (37, 18))
+    y = 0
+    for strip in strips:
+        expected.paste(strip, (0, y))
+        y += strip.height
+    f.seek(0)
+    with Image.open(f) as image:
+        image.load()
+        assert image.mode == "RGBA"
+        assert image.size == (37, 18)
+        assert image.tobytes() == expected.tobytes()
+        assert image.info["dpi"] == pytest.approx((300, 300), abs=0.01)
+
+
+def test_png_spans_several_idat_chunks(monkeypatch):
+    monkeypatch.setattr(sheet, "IDAT_SIZE", 64)
+    rng = np.random.default_rng(1)
+    # Large enough for the compressor to emit data before it is flushed
+    strip = random_image(rng, 128, 128)
+    f = io.BytesIO()
+    writer = PngStreamWriter(f, 128, 128)
+    writer.write_strip(strip)
+    writer.close()
+
+    assert f.getvalue().count(b"IDAT") > 1
+    f.seek(0)
+    with Image.open(f) as image:
+        assert image.tobytes() == strip.tobytes()
+        assert "dpi" not in image.info
+
+
+def test_png_rejects_invalid_strips():
+    writer = PngStreamWriter(io.BytesIO(), 4, 2)
+    with pytest.raises(ValueError):
+        writer.write_strip(Image.new("RGBA", (3, 1)))
+    with pytest.raises(ValueError):
+        writer.write_strip(Image.new("RGB", (4, 1)))
+    with pytest.raises(ValueError):
+        writer.write_strip(Image.new("RGBA", (4, 3)))
+    writer.write_strip(Image.new("RGBA", (4, 1)))
+    with pytest.raises(ValueError):
+        writer.close()
+    with pytest.raises(ValueError):
+        PngStreamWriter(io.BytesIO(), 0, 1)
+
+
+def test_sheet_layout():
+    layout = sheet_layout([(100, 20), (80, 30), (90, 10)], columns=2, gutter=5)
+    assert (layout.columns, layout.rows) == (2, 2)
+    assert (layout.cell_width, layout.cell_height) == (100, 30)
+    assert (layout.width, layout.height) == (215, 75)
+    assert [layout.cells_in_row(row) for row in range(2)] == [2, 1]
+    assert sheet_layout([(10, 10)], columns=10, gutter=0).columns == 1
+    with pytest.raises(ValueError):
+        sheet_layout([], columns=2, gutter=0)
+
+
+def test_main_reports_unwritable_output(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(buttonhole_cache, "path", str(tmp_path / "buttonholes"))
+    generate_corpus(str(tmp_path), 2, badges_per_preset=1)
+    assert sheet.main(["presets", "-o", "sheet.png", "-j", "1"]) == 0
+    assert os.path.isfile("sheet.png")
+
+    # A directory cannot be replaced by the sheet
+    os.mkdir("folder")
+    assert sheet.main(["presets", "-o", "folder", "-j", "1"]) == 1
+    assert "Failed to render sheet" in capsys.readouterr().err
+    assert sheet.main(["missing", "-j", "1"]) == 1
@@ -0,0 +1,45 @@
+import random
+
+import pytest
+from PIL import Image, ImageDraw
+
+from src.engine import FONT_PATH, FONT_SIZE
+from src.text import GlyphAtlas
+
+NAMES = [" A", "A ", "  ", " Anna Müller", "j", "Łukasz", "Jean-Luc O'Neill"]
+
+
+def expected_width(atlas: GlyphAtlas, text: str) -> int:
+    draw = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    draw.fontmode = "1"
+    bbox = draw.textbbox((0, 0), text, font=atlas.font)
+    return int(bbox[2] - bbox[0])
+
+
+@pytest.fixture(scope="module")
+def atlas() -> GlyphAtlas:
+    return GlyphAtlas(FONT_PATH, FONT_SIZE)
+
+
+@pytest.mark.parametrize("text", NAMES)
+def test_text_width_matches_imagedraw(atlas, text):
+    assert atlas.text_width(text) == expected_width(atlas, text)
+
+
+def test_random_names(atlas):
+    rng = random.Random(0)
+    alphabet = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZäöüß -'."
+    for _ in range(200):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randrange(1, 16)))
+        assert atlas.text_width(text) == expected_width(atlas, text), text
+
+
+@pytest.mark.parametrize("text", NAMES)
+def test_draw_text_matches_imagedraw(atlas, text):
+    expected = Image.new("RGBA", (120, 30))
+    draw = ImageDraw.Draw(expected)
+    draw.fontmode = "1"
+    draw.text((5, 5), text, font=atlas.font, fill=(255, 255, 255, 255))
+    image = Image.new("RGBA", (120, 30))
+    atlas.draw_text(image, (5, 5), text, (255, 255, 255, 255))
+    assert image.tobytes() == expected.tobytes()
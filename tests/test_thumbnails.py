@@ -0,0 +1,34 @@
+import os
+import time
+
+from PIL import Image
+
+from src.thumbnails import ThumbnailCache, make_thumbnail
+
+
+def test_make_thumbnail_keeps_aspect_ratio(tmp_path):
+    path = str(tmp_path / "badge.png")
+    Image.new("RGBA", (192, 24), (255, 0, 0, 255)).save(path)
+    assert make_thumbnail(path, (96, 48)).size == (96, 12)
+    Image.new("RGBA", (10, 10)).save(path)
+    assert make_thumbnail(path, (96, 48)).size == (10, 10)
+
+
+def test_poll_returns_thumbnails_with_busy_state(tmp_path):
+    source = str(tmp_path / "badge.png")
+    Image.new("RGBA", (200, 20), (0, 0, 255, 255)).save(source)
+    cache = ThumbnailCache(str(tmp_path / "thumbnails"))
+    cache.request("digest", source)
+
+    finished = []
+    deadline = time.monotonic() + 5
+    busy = True
+    while busy:
+        assert time.monotonic() < deadline
+        thumbnails, busy = cache.poll()
+        finished.extend(thumbnails)
+    assert [digest for digest, _ in finished] == ["digest"]
+    assert cache.lookup("digest") is not None
+    # Stored without leftover temporary files
+    files = os.listdir(tmp_path / "thumbnails")
+    assert len(files) == 1 and files[0].endswith(".png")
@@ -0,0 +1,81 @@
+from src.ui import KeyedFrameList
+
+
+class FakeFrame:
+    def __init__(self, item, index, length):
+        self.item = item
+        self.position = (index, length)
+        self.destroyed = False
+        self.packed = False
+
+    def set_position(self, index, length):
+        self.position = (index, length)
+
+    def refresh_ui(self):
+        pass
+
+    def destroy(self):
+        self.destroyed = True
+
+    def winfo_exists(self):
+        return not self.destroyed
+
+    def pack_forget(self):
+        self.packed = False
+
+
+class FrameList:
+    def __init__(self):
+        self.created = []
+        self.packed = []
+        self.frames = KeyedFrameList(self.create, self.pack)
+
+    def create(self, item, index, length):
+        frame = FakeFrame(item, index, length)
+        self.created.append(frame)
+        return frame
+
+    def pack(self, frame, index):
+        frame.packed = True
+        self.packed.append((frame.item, index))
+
+    def refresh(self, items):
+        self.created.clear()
+        self.packed.clear()
+        self.frames.refresh(items)
+
+
+def test_reuses_frames_of_items_still_in_list():
+    a, b, c = object(), object(), object()
+    frames = FrameList()
+    frames.refresh([a, b, c])
+    assert [frame.item for frame in frames.created] == [a, b, c]
+    first = {frame.item: frame for frame in frames.created}
+
+    d = object()
+    frames.refresh([a, c, d])
+    assert [frame.item for frame in frames.created] == [d]
+    assert first[b].destroyed
+    assert not first[a].destroyed and not first[c].destroyed
+    # a keeps its position and is not packed again
+    assert frames.packed == [(c, 1), (d, 2)]
+    assert first[c].position == (1, 3)
+
+
+def test_moves_items():
+    a, b, c = object(), object(), object()
+    frames = FrameList()
+    frames.refresh([a, b, c])
+    frames.refresh([a, c, b])
+    assert frames.created == []
+    assert frames.packed == [(c, 1), (b, 2)]
+
+
+def test_equal_items_get_own_frames():
+    frames = FrameList()
+    items = [[], []]
+    frames.refresh(items)
+    assert len(frames.created) == 2
+    frames.refresh(items[1:])
+    assert frames.created == []
+    assert frames.packed == [(items[1], 0)]